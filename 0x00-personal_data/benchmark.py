@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Module for benchmarking the redaction and password hashing paths."""
+import sys
+import json
+import time
+import random
+import string
+import logging
+import argparse
+import platform
+from typing import Callable, Dict, List
+
+from encrypt_password import hash_password, is_valid
+from filtered_logger import PII_FIELDS, RedactingFormatter, filter_datum
+
+
+SEED = 1337
+MESSAGE_LENGTHS = (64, 512, 4096)
+FIELD_COUNTS = (1, 5, 20)
+BCRYPT_ROUNDS = (4, 6, 8, 10)
+THRESHOLD = 0.10
+
+
+def _word(rng: random.Random, size: int) -> str:
+    """Random lowercase word."""
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(size))
+
+
+def make_fields(count: int) -> List[str]:
+    """PII_FIELDS padded with synthetic field names up to ``count``."""
+    extra = ['field{}'.format(i) for i in range(max(0, count - 5))]
+    return (list(PII_FIELDS) + extra)[:count]
+
+
+def make_messages(rng: random.Random, fields: List[str], length: int,
+                  count: int = 64) -> List[str]:
+    """Synthetic ``key=value;`` log lines of roughly ``length`` chars."""
+    keys = fields + ['ip', 'last_login', 'user_agent']
+    messages = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < length:
+            part = '{}={}'.format(rng.choice(keys), _word(rng, 12))
+            parts.append(part)
+            size += len(part) + 1
+        messages.append(';'.join(parts) + ';')
+    return messages
+
+
+def measure(fn: Callable, inputs: list, min_time: float) -> Dict[str, float]:
+    """Call ``fn`` over ``inputs`` until ``min_time`` has passed."""
+    samples = []
+    start = time.perf_counter()
+    while True:
+        for args in inputs:
+            t0 = time.perf_counter_ns()
+            fn(*args)
+            samples.append(time.perf_counter_ns() - t0)
+        if time.perf_counter() - start >= min_time:
+            break
+    samples.sort()
+    total = sum(samples) / 1e9
+    return {
+        'n': len(samples),
+        'ops_per_sec': len(samples) / total if total else 0.0,
+        'p50_us': samples[len(samples) // 2] / 1e3,
+        'p99_us': samples[min(len(samples) - 1,
+                              int(len(samples) * 0.99))] / 1e3,
+    }
+
+
+def run(min_time: float = 0.5, rounds=BCRYPT_ROUNDS) -> Dict[str, dict]:
+    """Run every benchmark case and return results keyed by case name."""
+    rng = random.Random(SEED)
+    results = {}
+    for count in FIELD_COUNTS:
+        fields = make_fields(count)
+        formatter = RedactingFormatter(fields)
+        for length in MESSAGE_LENGTHS:
+            messages = make_messages(rng, fields, length)
+            suffix = 'fields={},len={}'.format(count, length)
+            results['filter_datum[{}]'.format(suffix)] = measure(
+                filter_datum,
+                [(fields, '***', m, ';') for m in messages],
+                min_time,
+            )
+            records = [
+                (logging.LogRecord('user_data', logging.INFO, None, None,
+                                   m, None, None),)
+                for m in messages
+            ]
+            results['RedactingFormatter.format[{}]'.format(suffix)] = measure(
+                formatter.format, records, min_time,
+            )
+    passwords = [_word(rng, 16) for _ in range(4)]
+    for cost in rounds:
+        results['hash_password[rounds={}]'.format(cost)] = measure(
+            hash_password, [(p, cost) for p in passwords], min_time,
+        )
+        hashed = [(hash_password(p, cost), p) for p in passwords]
+        results['is_valid[rounds={}]'.format(cost)] = measure(
+            is_valid, hashed, min_time,
+        )
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            threshold: float = THRESHOLD) -> List[str]:
+    """Describe every case whose ops/sec fell more than ``threshold``."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or not base['ops_per_sec']:
+            continue
+        change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        if change < -threshold:
+            regressions.append('{}: {:.0f} -> {:.0f} ops/sec ({:+.1%})'.format(
+                name, base['ops_per_sec'], result['ops_per_sec'], change,
+            ))
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark filter_datum, RedactingFormatter and bcrypt."
+    )
+    parser.add_argument('-o', '--output', help="save results as JSON")
+    parser.add_argument('-c', '--compare', help="baseline JSON to check")
+    parser.add_argument('-t', '--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help="seconds spent on each case")
+    args = parser.parse_args(argv)
+
+    results = run(args.min_time)
+    for name, result in results.items():
+        print('{:<48} {:>12.0f} ops/s  p50 {:>10.1f}us  p99 {:>10.1f}us'
+              .format(name, result['ops_per_sec'], result['p50_us'],
+                      result['p99_us']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'seed': SEED,
+                },
+                'results': results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print('REGRESSION', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
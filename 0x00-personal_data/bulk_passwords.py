@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Module for hashing and verifying passwords in bulk."""
+import sys
+import time
+import argparse
+from typing import List
+
+from encrypt_password import hash_passwords, needs_rehash, verify_passwords
+
+
+def main(argv: List[str] = None) -> None:
+    """Command line entry point.
+
+    ``hash`` reads one password per line and writes one hash per line.
+    ``verify`` reads ``hash<TAB>password`` lines and writes true/false.
+    ``check`` reads one hash per line and writes whether it needs a rehash.
+    """
+    parser = argparse.ArgumentParser(
+        description="Hash, verify or check bcrypt passwords in bulk."
+    )
+    parser.add_argument('mode', choices=('hash', 'verify', 'check'))
+    parser.add_argument('input', nargs='?', type=argparse.FileType('r'),
+                        default=sys.stdin)
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'),
+                        default=sys.stdout)
+    parser.add_argument('-r', '--rounds', type=int, default=12)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=64)
+    args = parser.parse_args(argv)
+
+    lines = args.input.read().splitlines()
+    start = time.monotonic()
+    if args.mode == 'hash':
+        out = [h.decode('utf-8') for h in hash_passwords(
+            lines, args.rounds, args.workers, args.chunksize)]
+    elif args.mode == 'verify':
+        pairs = []
+        for line in lines:
+            hashed, password = line.split('\t', 1)
+            pairs.append((hashed.encode('utf-8'), password))
+        out = [str(ok).lower() for ok in verify_passwords(
+            pairs, args.workers, args.chunksize)]
+    else:
+        out = [str(needs_rehash(line.encode('utf-8'), args.rounds)).lower()
+               for line in lines]
+    args.output.write(''.join(line + '\n' for line in out))
+    elapsed = time.monotonic() - start
+    print("{} {} passwords in {:.2f}s".format(args.mode, len(lines), elapsed),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
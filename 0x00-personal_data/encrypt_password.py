@@ -1,13 +1,49 @@
 #!/usr/bin/env python3
 """Module whic encript a password."""
 import bcrypt
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Tuple
 
 
-def hash_password(password: str) -> bytes:
+def hash_password(password: str, rounds: int = 12) -> bytes:
     """Password haser with a bytes."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
     """Check if a hash password is created or not and valid."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def hash_cost(hashed_password: bytes) -> int:
+    """Return the cost factor stored in a bcrypt hash."""
+    return int(hashed_password.split(b'$')[2])
+
+
+def needs_rehash(hashed_password: bytes, rounds: int = 12) -> bool:
+    """Check if a hash was made with a cost other than ``rounds``."""
+    try:
+        return hash_cost(hashed_password) != rounds
+    except (IndexError, ValueError):
+        return True
+
+
+def _verify(pair: Tuple[bytes, str]) -> bool:
+    """Unpack a (hash, password) pair for is_valid."""
+    return is_valid(*pair)
+
+
+def hash_passwords(passwords: Iterable[str], rounds: int = 12,
+                   workers: int = None, chunksize: int = 64) -> List[bytes]:
+    """Hash many passwords across a process pool, keeping their order."""
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(partial(hash_password, rounds=rounds),
+                             passwords, chunksize=chunksize))
+
+
+def verify_passwords(pairs: Iterable[Tuple[bytes, str]], workers: int = None,
+                     chunksize: int = 64) -> List[bool]:
+    """Check many (hash, password) pairs across a process pool."""
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_verify, pairs, chunksize=chunksize))
@@ -2,9 +2,18 @@
 """Module for filtering log data."""
 import os
 import re
+import copy
+import queue
+import sys
+import time
 import logging
+import resource
+import threading
 import mysql.connector
-from typing import List
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
 
 
 patterns = {
@@ -12,62 +21,288 @@ patterns = {
     'replace': lambda x: r'\g<field>={}'.format(x),
 }
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+ENGINE_CACHE_SIZE = 128
+USER_FIELDS = "name,email,phone,ssn,password,ip,last_login,user_agent"
+BATCH_SIZE = 1000
+QUEUE_SIZE = 10000
+POOL_SIZE = 5
+POOL_MAX_IDLE = 300.0
+
+
+class RedactionEngine:
+    """Compiled redaction rules for one fields/separator/redaction set."""
+
+    def __init__(self, fields: Tuple[str, ...], redaction: str,
+                 separator: str):
+        """Compile the extract pattern once."""
+        extract, replace = (patterns["extract"], patterns["replace"])
+        self.fields = tuple(fields)
+        self.redaction = redaction
+        self.separator = separator
+        self._regex = re.compile(extract(self.fields, separator))
+        self._replacement = replace(redaction)
+        self._keys = None
+        if all(re.escape(field) == field for field in self.fields):
+            names = self.fields or ('',)
+            self._keys = tuple('{}='.format(name) for name in names)
+
+    def redact(self, message: str) -> str:
+        """Return the message with every field value redacted."""
+        if self._keys is not None:
+            if '=' not in message:
+                return message
+            if not any(key in message for key in self._keys):
+                return message
+        return self._regex.sub(self._replacement, message)
+
+
+@lru_cache(maxsize=ENGINE_CACHE_SIZE)
+def _cached_engine(fields: Tuple[str, ...], redaction: str,
+                   separator: str) -> RedactionEngine:
+    """Build and memoize a redaction engine."""
+    return RedactionEngine(fields, redaction, separator)
+
+
+def get_engine(fields: List[str], redaction: str,
+               separator: str) -> RedactionEngine:
+    """Return the shared redaction engine for the given settings."""
+    return _cached_engine(tuple(fields), redaction, separator)
 
 
 def filter_datum(
         fields: List[str], redaction: str, message: str, separator: str,
         ) -> str:
     """Return the log message obfuscated."""
-    extract, replace = (patterns["extract"], patterns["replace"])
-    return re.sub(extract(fields, separator), replace(redaction), message)
+    return get_engine(fields, redaction, separator).redact(message)
 
 
-def get_logger() -> logging.Logger:
-    """Create a Log which is new for a user."""
+def get_logger(queued: bool = False,
+               overflow: str = "block") -> logging.Logger:
+    """Create a Log which is new for a user.
+
+    With ``queued`` the redaction and stream I/O run on a background
+    thread; ``overflow`` picks what happens when its queue is full.
+    Calling it again returns the logger with its existing handler.
+    """
     logger = logging.getLogger("user_data")
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    logger.addHandler(stream_handler)
+    if logger.handlers:
+        return logger
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
+    if queued:
+        logger.addHandler(QueuedHandler(stream_handler, overflow=overflow))
+    else:
+        logger.addHandler(stream_handler)
     return logger
 
 
+def db_config() -> dict:
+    """Connection settings read from the PERSONAL_DATA_DB_* variables."""
+    return {
+        "host": os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        "port": int(os.getenv("PERSONAL_DATA_DB_PORT", "3306")),
+        "user": os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        "password": os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
+        "database": os.getenv("PERSONAL_DATA_DB_NAME", ""),
+    }
+
+
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """Database connector."""
-    db_host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
-    db_name = os.getenv("PERSONAL_DATA_DB_NAME", "")
-    db_user = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
-    db_pwd = os.getenv("PERSONAL_DATA_DB_PASSWORD", "")
-    connection = mysql.connector.connect(
-        host=db_host,
-        port=3306,
-        user=db_user,
-        password=db_pwd,
-        database=db_name,
-    )
-    return connection
+    return mysql.connector.connect(**db_config())
+
+
+def _is_alive(connection) -> bool:
+    """Check that a connection still answers the server."""
+    try:
+        return bool(connection.is_connected())
+    except Exception:
+        return False
+
+
+def _reset(connection) -> bool:
+    """Roll back what a borrower left open, False if the connection failed."""
+    try:
+        if getattr(connection, 'unread_result', False):
+            connection.consume_results()
+        connection.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(connection) -> None:
+    """Close a connection, ignoring errors from a dead socket."""
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Bounded pool of health-checked database connections."""
+
+    def __init__(self, connect: Callable[[], object],
+                 size: int = POOL_SIZE, max_idle: float = POOL_MAX_IDLE):
+        """Set up an empty pool around a connection factory."""
+        self._connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Hand out an idle connection or open a new one."""
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("no database connection available")
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    return self._connect()
+                connection, last_used = item
+                idle = time.monotonic() - last_used
+                if idle <= self.max_idle and _is_alive(connection):
+                    return connection
+                _close_quietly(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection) -> None:
+        """Give a connection back to the pool, reset for the next borrower.
+
+        An open transaction is rolled back and an unread result consumed;
+        a connection that fails to reset is closed instead of pooled.
+        """
+        try:
+            if _reset(connection):
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+            else:
+                _close_quietly(connection)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of a with block."""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            _close_quietly(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_db_pool(connect: Callable[[], object] = None) -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if connect is None:
+                def connect():
+                    return mysql.connector.connect(**db_config())
+            _pool = ConnectionPool(
+                connect,
+                size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", POOL_SIZE)),
+                max_idle=float(
+                    os.getenv("PERSONAL_DATA_DB_MAX_IDLE", POOL_MAX_IDLE)
+                ),
+            )
+        return _pool
+
+
+def stream_rows(connection, query: str, batch_size: int) -> Iterator[list]:
+    """Yield the query result in batches from an unbuffered cursor."""
+    with connection.cursor(buffered=False) as cursor:
+        cursor.execute(query)
+        rows = cursor.fetchmany(batch_size)
+        while rows:
+            yield rows
+            rows = cursor.fetchmany(batch_size)
+
+
+def row_message(columns: List[str], row: tuple) -> str:
+    """Build the log message for a single row."""
+    pairs = ('{}={}'.format(col, val) for col, val in zip(columns, row))
+    return '{};'.format('; '.join(pairs))
+
+
+def write_batch(handler: logging.Handler,
+                records: List[logging.LogRecord]) -> None:
+    """Format records and hand them to a handler in a single write."""
+    records = [r for r in records
+               if r.levelno >= handler.level and handler.filter(r)]
+    if not isinstance(handler, logging.StreamHandler):
+        for record in records:
+            handler.handle(record)
+        return
+    handler.acquire()
+    try:
+        lines = [handler.format(record) for record in records]
+        if lines:
+            handler.stream.write(
+                handler.terminator.join(lines) + handler.terminator
+            )
+            handler.flush()
+    finally:
+        handler.release()
+
+
+def emit_batch(logger: logging.Logger,
+               records: List[logging.LogRecord]) -> None:
+    """Format and write a batch of records with one write per handler."""
+    for handler in logger.handlers:
+        write_batch(handler, records)
+
+
+def export_users(logger: logging.Logger, connection,
+                 batch_size: int = BATCH_SIZE) -> int:
+    """Stream the users table through the logger, return rows exported."""
+    columns = USER_FIELDS.split(',')
+    query = "SELECT {} FROM users;".format(USER_FIELDS)
+    count = 0
+    for rows in stream_rows(connection, query, batch_size):
+        records = []
+        for row in rows:
+            args = ("user_data", logging.INFO, None, None,
+                    row_message(columns, row), None, None)
+            records.append(logging.LogRecord(*args))
+        emit_batch(logger, records)
+        count += len(records)
+    return count
 
 
 def main():
     """Information about user records in a table of the logs."""
-    fields = "name,email,phone,ssn,password,ip,last_login,user_agent"
-    columns = fields.split(',')
-    query = "SELECT {} FROM users;".format(fields)
+    batch_size = int(os.getenv("PERSONAL_DATA_BATCH_SIZE", BATCH_SIZE))
     info_logger = get_logger()
     connection = get_db()
-    with connection.cursor() as cursor:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            record = map(
-                lambda x: '{}={}'.format(x[0], x[1]),
-                zip(columns, row),
-            )
-            msg = '{};'.format('; '.join(list(record)))
-            args = ("user_data", logging.INFO, None, None, msg, None, None)
-            log_record = logging.LogRecord(*args)
-            info_logger.handle(log_record)
+    start = time.monotonic()
+    try:
+        count = export_users(info_logger, connection, batch_size)
+    finally:
+        connection.close()
+    elapsed = time.monotonic() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print("exported {} rows in {:.2f}s ({:.0f} rows/sec), peak RSS {} KiB"
+          .format(count, elapsed, rate, peak_rss), file=sys.stderr)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -82,12 +317,116 @@ class RedactingFormatter(logging.Formatter):
         """Start a List."""
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.engine = get_engine(fields, self.REDACTION, self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
         """Record for a format log checker."""
         msg = super(RedactingFormatter, self).format(record)
-        txt = filter_datum(self.fields, self.REDACTION, msg, self.SEPARATOR)
-        return txt
+        return self.engine.redact(msg)
+
+
+class QueuedHandler(logging.Handler):
+    """Hand records to a background writer through a bounded queue.
+
+    ``overflow`` is one of ``block`` (wait for room), ``drop_oldest``
+    (discard the oldest queued record) or ``drop`` (discard the new
+    record); discarded records are counted in ``dropped``.
+    """
+
+    OVERFLOW_POLICIES = ("block", "drop_oldest", "drop")
+    _STOP = object()
+
+    def __init__(self, target: logging.Handler, maxsize: int = QUEUE_SIZE,
+                 overflow: str = "block", batch_size: int = BATCH_SIZE):
+        """Start the listener thread writing to ``target``."""
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("unknown overflow policy: {}".format(overflow))
+        super(QueuedHandler, self).__init__()
+        self.target = target
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.queue = queue.Queue(maxsize)
+        self._listener = threading.Thread(
+            target=self._listen, name="user_data-log-listener", daemon=True
+        )
+        self._listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Copy a record with its message and traceback rendered now.
+
+        Like ``QueueHandler.prepare``, ``msg % args`` is merged on the
+        logging thread, so arguments changed later cannot alter the line;
+        redaction and layout are left to the target's formatter.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                formatter = self.target.formatter or logging.Formatter()
+                record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Enqueue a prepared record according to the overflow policy."""
+        try:
+            record = self.prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if self.overflow == "drop":
+                    return
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                self.dropped -= 1
+
+    def _listen(self) -> None:
+        """Drain the queue in batches until told to stop."""
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not self._STOP]
+            try:
+                if records:
+                    write_batch(self.target, records)
+            except Exception:
+                self.handleError(records[0])
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if len(records) != len(batch):
+                return
+
+    def flush(self) -> None:
+        """Wait until every queued record has been written."""
+        if self._listener.is_alive():
+            self.queue.join()
+        self.target.flush()
+
+    def close(self) -> None:
+        """Flush pending records and stop the listener."""
+        if self._listener.is_alive():
+            self.queue.put(self._STOP)
+            self._listener.join()
+        self.target.close()
+        super(QueuedHandler, self).close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Module for redacting existing log files in parallel."""
+import os
+import sys
+import mmap
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_engine
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+_worker = {}
+
+
+def chunk_bounds(mm: mmap.mmap, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) offsets of chunks that end on a line boundary."""
+    size = len(mm)
+    start = 0
+    while start < size:
+        end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def _init_worker(path: str, fields: List[str], redaction: str,
+                 separator: str) -> None:
+    """Map the input file and build the redaction engine once per worker."""
+    with open(path, 'rb') as f:
+        _worker['mm'] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker['engine'] = get_engine(fields, redaction, separator)
+
+
+def _redact_chunk(bounds: Tuple[int, int]) -> bytes:
+    """Redact every line of one chunk of the input file."""
+    start, end = bounds
+    redact = _worker['engine'].redact
+    text = _worker['mm'][start:end].decode('utf-8', 'surrogateescape')
+    lines = text.split('\n')
+    return '\n'.join(map(redact, lines)).encode('utf-8', 'surrogateescape')
+
+
+def redact_file(src: str, dst: str, fields: List[str], redaction: str,
+                separator: str, workers: int = None,
+                chunk_size: int = CHUNK_SIZE, progress=sys.stderr) -> int:
+    """Redact ``src`` into ``dst`` across a process pool, return bytes read."""
+    workers = workers or os.cpu_count() or 1
+    total = os.path.getsize(src)
+    start = time.monotonic()
+    done = 0
+    with open(dst, 'wb') as out:
+        if total == 0:
+            return 0
+        with open(src, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        initargs = (src, list(fields), redaction, separator)
+        with mm, ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=initargs) as pool:
+            pending = deque()
+            for bounds in chunk_bounds(mm, chunk_size):
+                pending.append((bounds, pool.submit(_redact_chunk, bounds)))
+                while len(pending) > 2 * workers:
+                    done += _write_next(out, pending)
+                    _report(progress, done, total, start)
+            while pending:
+                done += _write_next(out, pending)
+                _report(progress, done, total, start)
+    if progress is not None:
+        progress.write('\n')
+    return done
+
+
+def _write_next(out, pending: deque) -> int:
+    """Write the oldest pending chunk, return its input size."""
+    (start, end), future = pending.popleft()
+    out.write(future.result())
+    return end - start
+
+
+def _report(progress, done: int, total: int, start: float) -> None:
+    """Print progress and throughput."""
+    if progress is None:
+        return
+    elapsed = max(time.monotonic() - start, 1e-9)
+    progress.write('\r{:6.1%} {:.1f}/{:.1f} MiB {:.1f} MiB/s'.format(
+        done / total, done / 2 ** 20, total / 2 ** 20,
+        done / 2 ** 20 / elapsed,
+    ))
+    progress.flush()
+
+
+def main(argv: List[str] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Redact PII fields from existing log files."
+    )
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--fields', default=','.join(PII_FIELDS),
+                        help="comma separated fields to redact")
+    parser.add_argument('--separator', default=RedactingFormatter.SEPARATOR)
+    parser.add_argument('--redaction', default=RedactingFormatter.REDACTION)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help="target chunk size in bytes")
+    args = parser.parse_args(argv)
+    redact_file(args.input, args.output, args.fields.split(','),
+                args.redaction, args.separator, args.workers,
+                args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
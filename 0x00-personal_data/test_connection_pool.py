@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Tests for the ConnectionPool of filtered_logger.
+
+Run with `python3 -m unittest test_connection_pool`.
+"""
+import threading
+import unittest
+from unittest import mock
+
+from filtered_logger import ConnectionPool
+
+
+class FakeConnection:
+    """Connection double recording what the pool does with it."""
+
+    def __init__(self, number: int):
+        """A live connection with nothing pending."""
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+        self.unread_result = False
+        self.in_transaction = False
+
+    def is_connected(self) -> bool:
+        """Answer the health check."""
+        return self.alive and not self.closed
+
+    def consume_results(self) -> None:
+        """Drop an unread result."""
+        self.unread_result = False
+
+    def rollback(self) -> None:
+        """Roll back, failing like a dead socket when not alive."""
+        if not self.alive:
+            raise OSError("connection lost")
+        if self.unread_result:
+            raise RuntimeError("unread result found")
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.closed = True
+
+
+class FakeConnector:
+    """Connection factory numbering the connections it opens."""
+
+    def __init__(self):
+        """No connection opened yet."""
+        self.opened = []
+
+    def __call__(self) -> FakeConnection:
+        """Open a new connection."""
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+    """ConnectionPool driven through a fake connect."""
+
+    def setUp(self):
+        """A pool of two connections idling for at most 10 seconds."""
+        self.connect = FakeConnector()
+        self.pool = ConnectionPool(self.connect, size=2, max_idle=10.0)
+
+    def test_reuses_released_connection(self):
+        """A released connection is handed out again."""
+        first = self.pool.acquire()
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        self.assertEqual(len(self.connect.opened), 1)
+
+    def test_returns_connection_on_context_exit(self):
+        """The with block gives its connection back, even on error."""
+        with self.pool.connection() as first:
+            pass
+        with self.assertRaises(ValueError):
+            with self.pool.connection() as second:
+                raise ValueError("query failed")
+        self.assertIs(second, first)
+        with self.pool.connection() as third:
+            self.assertIs(third, first)
+        self.assertEqual(len(self.connect.opened), 1)
+
+    def test_evicts_connection_failing_health_check(self):
+        """A dead idle connection is closed and replaced."""
+        first = self.pool.acquire()
+        self.pool.release(first)
+        first.alive = False
+        second = self.pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+
+    def test_expires_connection_idle_too_long(self):
+        """A connection idle for more than max_idle is closed."""
+        with mock.patch('filtered_logger.time.monotonic', return_value=100.0):
+            first = self.pool.acquire()
+            self.pool.release(first)
+        with mock.patch('filtered_logger.time.monotonic', return_value=105.0):
+            self.assertIs(self.pool.acquire(), first)
+            self.pool.release(first)
+        with mock.patch('filtered_logger.time.monotonic', return_value=116.0):
+            second = self.pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+
+    def test_times_out_when_exhausted(self):
+        """Acquire waits for a slot, then raises TimeoutError."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire(timeout=0.05)
+        self.pool.release(held[0])
+        self.assertIs(self.pool.acquire(timeout=0.05), held[0])
+
+    def test_release_wakes_waiting_borrower(self):
+        """A borrower blocked on a full pool gets the released connection."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+        waiter = threading.Thread(
+            target=lambda: got.append(self.pool.acquire(timeout=5)))
+        waiter.start()
+        self.pool.release(held[1])
+        waiter.join()
+        self.assertEqual(got, [held[1]])
+
+    def test_rolls_back_on_release(self):
+        """An open transaction and unread result do not leak."""
+        with self.pool.connection() as first:
+            first.in_transaction = True
+            first.unread_result = True
+        self.assertEqual(first.rollbacks, 1)
+        self.assertFalse(first.in_transaction)
+        self.assertFalse(first.unread_result)
+        self.assertIs(self.pool.acquire(), first)
+
+    def test_closes_connection_failing_reset(self):
+        """A connection that cannot roll back is not pooled."""
+        with self.pool.connection() as first:
+            first.alive = False
+        self.assertTrue(first.closed)
+        self.assertIsNot(self.pool.acquire(), first)
+
+    def test_failed_connect_frees_slot(self):
+        """A connect error does not leak a pool slot."""
+        def fail():
+            raise OSError("server down")
+        pool = ConnectionPool(fail, size=1)
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                pool.acquire(timeout=0.05)
+
+    def test_close_closes_idle_connections(self):
+        """close() shuts every idle connection."""
+        first, second = self.pool.acquire(), self.pool.acquire()
+        self.pool.release(first)
+        self.pool.release(second)
+        self.pool.close()
+        self.assertTrue(first.closed and second.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
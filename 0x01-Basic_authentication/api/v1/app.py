@@ -3,11 +3,13 @@
 """
 import os
 from os import getenv
+from functools import wraps
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
 
+from api.v1 import metrics
 from api.v1.views import app_views
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, PathMatcher
 from api.v1.auth.basic_auth import BasicAuth
 
 
@@ -15,6 +17,11 @@ app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+excluded_paths = PathMatcher([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+])
 auth_type = getenv('AUTH_TYPE', 'auth')
 if auth_type == 'auth':
     auth = Auth()
@@ -40,24 +47,86 @@ def forbidden(error) -> str:
     return jsonify({"error": "Forbidden"}), 403
 
 
+def time_jsonify(app):
+    """Run the serialization of jsonify responses in the `jsonify` stage."""
+    provider = getattr(app, 'json', None)
+    if hasattr(provider, 'response'):
+        response = provider.response
+
+        def timed_response(*args, **kwargs):
+            with metrics.timer('jsonify'):
+                return response(*args, **kwargs)
+        provider.response = timed_response
+        return
+
+    class TimedJSONEncoder(app.json_encoder):
+        """JSON encoder timing each encoding."""
+
+        def encode(self, o):
+            """Encode inside the `jsonify` stage."""
+            with metrics.timer('jsonify'):
+                return super().encode(o)
+    app.json_encoder = TimedJSONEncoder
+
+
+def timed_view(view):
+    """Wrap a view function in the `view` stage."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with metrics.timer('view'):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def auth_metrics():
+    """Credential cache counters of the configured auth."""
+    cache = getattr(auth, 'credential_cache', None)
+    if cache is None:
+        return []
+    return [
+        ('api_auth_cache_hits_total', 'counter', (), cache.hits),
+        ('api_auth_cache_misses_total', 'counter', (), cache.misses),
+        ('api_auth_cache_entries', 'gauge', (), len(cache)),
+    ]
+
+
+if metrics.ENABLED:
+    time_jsonify(app)
+    for endpoint, view in list(app.view_functions.items()):
+        app.view_functions[endpoint] = timed_view(view)
+    app.before_request(metrics.start_request)
+    metrics.REGISTRY.add_collector(auth_metrics)
+
+
 @app.before_request
 def authenticate_user():
     """Authenticate before request."""
     if auth:
-        excluded_paths = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-        ]
-        if auth.require_auth(request.path, excluded_paths):
-            auth_header = auth.authorization_header(request)
-            user = auth.current_user(request)
+        with metrics.timer('require_auth'):
+            required = auth.require_auth(request.path, excluded_paths)
+        if required:
+            with metrics.timer('authorization_header'):
+                auth_header = auth.authorization_header(request)
+            with metrics.timer('current_user'):
+                user = auth.current_user(request)
             if auth_header is None:
                 abort(401)
             if user is None:
                 abort(403)
 
 
+@app.after_request
+def server_timing(response):
+    """Record the request latency and add its Server-Timing header."""
+    if metrics.ENABLED:
+        rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+        timing = metrics.finish_request(request.method, rule,
+                                        response.status_code)
+        if timing:
+            response.headers['Server-Timing'] = timing
+    return response
+
+
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
     port = getenv("API_PORT", "5000")
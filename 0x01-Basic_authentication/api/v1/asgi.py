@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""ASGI serving module for the API.
+
+Run it with any ASGI server, e.g. `uvicorn api.v1.asgi:app`.
+"""
+import io
+import sys
+import asyncio
+import threading
+from os import getenv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from api.v1.app import app as wsgi_app
+from models.base import sync
+
+
+class BodyTooLarge(Exception):
+    """Raised when a request body exceeds the accepted size."""
+
+
+class ASGIApp:
+    """ASGI front of the Flask API.
+
+    Connections, keep-alive and request bodies are handled on the event
+    loop without holding a thread. Each request then runs the unchanged
+    Flask app, with its auth, views, hashing and persistence, on a
+    bounded thread pool, so routes behave exactly as under WSGI.
+    """
+
+    def __init__(self, wsgi: Callable, workers: int = 32,
+                 max_body: int = 16 * 1024 * 1024, window: int = 16):
+        """Initializes the front of a WSGI app.
+
+        Args:
+            wsgi (Callable): The WSGI application.
+            workers (int): Threads running requests at the same time.
+            max_body (int): Largest accepted request body, in bytes.
+            window (int): Response chunks a request may have produced
+                ahead of the client.
+        """
+        self.wsgi = wsgi
+        self.max_body = max_body
+        self.window = window
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='api')
+
+    async def __call__(self, scope: dict, receive: Callable,
+                       send: Callable) -> None:
+        """Handles one ASGI connection scope."""
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        """Flushes pending writes and stops the pool on shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, sync)
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive: Callable) -> Optional[bytes]:
+        """Reads the request body.
+
+        Returns None if the client disconnected.
+
+        Raises:
+            BodyTooLarge: The body is larger than `max_body`.
+        """
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body:
+                raise BodyTooLarge(size)
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def _http(self, scope: dict, receive: Callable,
+                    send: Callable) -> None:
+        """Runs one request through the WSGI app off the event loop.
+
+        The app call, the iteration of its response and its close all
+        run in one job on one pool thread, as under a threaded WSGI
+        server, so Flask's thread-bound request context holds for a
+        whole streamed response. The chunks reach the event loop through
+        a queue, with at most `window` of them waiting to be sent.
+        """
+        try:
+            body = await self._read_body(receive)
+        except BodyTooLarge:
+            await send({'type': 'http.response.start', 'status': 413,
+                        'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body',
+                        'body': b'Request body too large'})
+            return
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        window = threading.Semaphore(self.window)
+        stopped = threading.Event()
+        response = {}
+
+        def hand(chunk: bytes) -> bool:
+            # Runs on the pool thread; False once the client is gone.
+            window.acquire()
+            if stopped.is_set():
+                return False
+            response['sent'] = True
+            loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            return True
+
+        def start_response(status: str, headers: List[Tuple[str, str]],
+                           exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+            return hand
+
+        def serve():
+            try:
+                result = self.wsgi(environ(scope, body), start_response)
+                try:
+                    for chunk in result:
+                        if chunk and not hand(chunk):
+                            break
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        job = loop.run_in_executor(self.executor, serve)
+        try:
+            chunk = await queue.get()
+            if chunk is None:
+                await job
+            await send({'type': 'http.response.start',
+                        'status': response['status'],
+                        'headers': response['headers']})
+            while chunk is not None:
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+                window.release()
+                chunk = await queue.get()
+            await job
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Unblock the job if it waits on a full window; it then sees
+            # `stopped`, closes the response and ends.
+            stopped.set()
+            window.release()
+
+
+def environ(scope: dict, body: bytes) -> dict:
+    """Builds the PEP 3333 environ of an ASGI HTTP scope.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        body (bytes): The complete request body.
+
+    Returns:
+        dict: The WSGI environ.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    env = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in env:
+            value = env[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        env[key] = value
+    if body and 'CONTENT_LENGTH' not in env:
+        env['CONTENT_LENGTH'] = str(len(body))
+    return env
+
+
+app = ASGIApp(
+    wsgi_app,
+    workers=int(getenv('API_ASGI_WORKERS', '32')),
+    max_body=int(getenv('API_ASGI_MAX_BODY', str(16 * 1024 * 1024))),
+)
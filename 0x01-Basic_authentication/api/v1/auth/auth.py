@@ -2,19 +2,87 @@
 """Authentication module for the API.
 """
 import re
-from typing import List, TypeVar
+from functools import lru_cache
+from typing import Iterable, List, Tuple, TypeVar, Union
 from flask import request
 
 
+class PathMatcher:
+    """Precompiled matcher for a list of excluded paths.
+
+    Entries ending with `*` match any path starting with the rest of
+    the entry; other entries must equal the slash-normalized path.
+    Exact entries live in a set and wildcard prefixes in a character
+    trie, so a lookup costs O(len(path)) whatever the list length.
+    """
+    _END = ''
+
+    def __init__(self, excluded_paths: Iterable[str]):
+        """Compiles the exclusion list.
+
+        Args:
+            excluded_paths (Iterable[str]): Paths that do not require
+                authentication.
+        """
+        self._exact = set()
+        self._prefixes = {}
+        self._size = 0
+        for exclusion_path in excluded_paths:
+            exclusion_path = exclusion_path.strip()
+            self._size += 1
+            if exclusion_path.endswith('*'):
+                node = self._prefixes
+                for char in exclusion_path[:-1]:
+                    node = node.setdefault(char, {})
+                node[self._END] = True
+            else:
+                self._exact.add(exclusion_path)
+
+    def __len__(self) -> int:
+        """Returns the number of compiled exclusions."""
+        return self._size
+
+    def matches(self, path: str) -> bool:
+        """Checks if a slash-normalized path is excluded.
+
+        Args:
+            path (str): The path, ending with a slash.
+
+        Returns:
+            bool: True if the path matches an exclusion.
+        """
+        if path in self._exact:
+            return True
+        node = self._prefixes
+        if self._END in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+
+@lru_cache(maxsize=32)
+def _compile_excluded_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """Builds and memoizes the matcher of an exclusion list."""
+    return PathMatcher(excluded_paths)
+
+
 class Auth:
     """Authentication class.
     """
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], PathMatcher]) -> bool:
         """Checks if a path requires authentication.
         
         Args:
             path (str): The path to check.
-            excluded_paths (List[str]): A list of paths that do not require authentication.
+            excluded_paths (Union[List[str], PathMatcher]): The paths that
+                do not require authentication, as a list or a precompiled
+                matcher.
         
         Returns:
             bool: True if the path requires authentication, False otherwise.
@@ -23,19 +91,12 @@ class Auth:
             return True
 
         # Ensure path always ends with a slash for consistent matching
-        if path[-1] != '/':
+        if path[-1:] != '/':
             path += '/'
 
-        for exclusion_path in map(lambda x: x.strip(), excluded_paths):
-            # Handle wildcard (*) at the end of paths
-            if exclusion_path.endswith('*'):
-                if path.startswith(exclusion_path[:-1]):
-                    return False
-            # Handle exact path match
-            elif path == exclusion_path:
-                return False
-
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = _compile_excluded_paths(tuple(excluded_paths))
+        return not excluded_paths.matches(path)
 
     def authorization_header(self, request=None) -> str:
         """Gets the authorization header field from the request.
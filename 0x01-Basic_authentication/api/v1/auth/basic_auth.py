@@ -4,8 +4,11 @@
 import re
 import base64
 import binascii
+from os import getenv
 from typing import Tuple, TypeVar, Optional
 from .auth import Auth
+from api.v1 import metrics
+from .credential_cache import CredentialCache
 from models.user import User
 
 
@@ -13,6 +16,16 @@ class BasicAuth(Auth):
     """Basic authentication class.
     """
 
+    def __init__(self):
+        """Initializes the verified credentials cache.
+
+        Its size and TTL come from AUTH_CACHE_SIZE and AUTH_CACHE_TTL.
+        """
+        self.credential_cache = CredentialCache(
+            max_size=int(getenv('AUTH_CACHE_SIZE', '1024')),
+            ttl=float(getenv('AUTH_CACHE_TTL', '60')),
+        )
+
     def extract_base64_authorization_header(
             self,
             authorization_header: str) -> Optional[str]:
@@ -90,13 +103,38 @@ class BasicAuth(Auth):
         """
         if isinstance(user_email, str) and isinstance(user_pwd, str):
             try:
-                users = User.search({'email': user_email})
+                with metrics.timer('search'):
+                    users = User.search({'email': user_email})
             except Exception:
                 return None
-            if users and users[0].is_valid_password(user_pwd):
-                return users[0]
+            if users:
+                with metrics.timer('hash'):
+                    valid = users[0].is_valid_password(user_pwd)
+                if valid:
+                    return users[0]
         return None
 
+    @staticmethod
+    def _cached_user(entry: Tuple[str, str, str]) -> Optional[TypeVar('User')]:
+        """Resolves a cached credential to its live user.
+
+        Args:
+            entry (Tuple[str, str, str]): The cached id, email and
+                password hash.
+
+        Returns:
+            Optional[User]: The user, or None if it was removed or its
+            email or password changed since the entry was cached.
+        """
+        user_id, email, password = entry
+        try:
+            user = User.get(user_id)
+        except Exception:
+            return None
+        if user is None or user.email != email or user.password != password:
+            return None
+        return user
+
     def current_user(self, request=None) -> Optional[TypeVar('User')]:
         """Retrieves the user from a request.
 
@@ -107,11 +145,26 @@ class BasicAuth(Auth):
             Optional[User]: The authenticated user, or None if authentication fails.
         """
         auth_header = self.authorization_header(request)
-        b64_auth_token = self.extract_base64_authorization_header(auth_header)
-        if b64_auth_token:
-            auth_token = self.decode_base64_authorization_header(b64_auth_token)
-            if auth_token:
-                email, password = self.extract_user_credentials(auth_token)
-                if email and password:
-                    return self.user_object_from_credentials(email, password)
-        return None
+        if not isinstance(auth_header, str):
+            return None
+        with metrics.timer('auth_cache'):
+            cache_key = self.credential_cache.key(auth_header)
+            user = self.credential_cache.get(cache_key, self._cached_user)
+        if user is not None:
+            return user
+        email = password = None
+        with metrics.timer('base64'):
+            b64_auth_token = self.extract_base64_authorization_header(
+                auth_header)
+            if b64_auth_token:
+                auth_token = self.decode_base64_authorization_header(
+                    b64_auth_token)
+                if auth_token:
+                    email, password = self.extract_user_credentials(auth_token)
+        if email and password:
+            user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            self.credential_cache.put(
+                cache_key, (user.id, user.email, user.password)
+            )
+        return user
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Verified credentials cache module for the API.
+"""
+import os
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class CredentialCache:
+    """Bounded, TTL-based cache of verified credentials.
+
+    Entries are keyed by an HMAC of the Authorization header under a
+    per-process secret, so plaintext credentials are never stored.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0,
+                 secret: bytes = None):
+        """Initializes an empty cache.
+
+        Args:
+            max_size (int): The maximum number of cached entries.
+            ttl (float): Seconds an entry stays valid.
+            secret (bytes): The HMAC key, random when not given.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._secret = secret or os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, authorization_header: str) -> bytes:
+        """Computes the cache key of an Authorization header.
+
+        Args:
+            authorization_header (str): The raw header value.
+
+        Returns:
+            bytes: The keyed digest of the header.
+        """
+        return hmac.new(
+            self._secret,
+            authorization_header.encode('utf-8', 'surrogateescape'),
+            hashlib.sha256
+        ).digest()
+
+    def get(self, key: bytes,
+            resolve: Callable[[Any], Any] = None) -> Optional[Any]:
+        """Looks up a cached entry.
+
+        Args:
+            key (bytes): The cache key.
+            resolve (Callable): Maps the stored value to a live object,
+                returning None when the entry went stale.
+
+        Returns:
+            Optional[Any]: The cached (resolved) value, or None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            value = None
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    value = entry[1]
+                else:
+                    del self._entries[key]
+        if value is not None and resolve is not None:
+            value = resolve(value)
+            if value is None:
+                self.discard(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        """Stores a verified entry, evicting the least recently used.
+
+        Args:
+            key (bytes): The cache key.
+            value (Any): The value to cache.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: bytes) -> None:
+        """Removes an entry if present.
+
+        Args:
+            key (bytes): The cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Returns the number of cached entries."""
+        return len(self._entries)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Request instrumentation module for the API.
+"""
+import time
+import bisect
+import threading
+from os import getenv
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+ENABLED = getenv('API_METRICS', '0') == '1'
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_NULL = nullcontext()
+_request = threading.local()
+
+
+class Registry:
+    """Histograms recorded without locks, merged when scraped.
+
+    Every thread observes into its own shard, so the hot path never
+    waits on another thread; the shards of finished threads are folded
+    into a retired shard when a new thread registers or on scrape.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        """Initializes an empty registry.
+
+        Args:
+            buckets (Tuple[float, ...]): Sorted upper bounds, in seconds.
+        """
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: Tuple[Tuple[str, str], ...],
+                seconds: float) -> None:
+        """Records one duration in a histogram.
+
+        Args:
+            name (str): The metric name.
+            labels (Tuple[Tuple[str, str], ...]): The label pairs.
+            seconds (float): The observed duration.
+        """
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._register()
+        series = shard.get((name, labels))
+        if series is None:
+            series = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[(name, labels)] = series
+        series[bisect.bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def _register(self) -> dict:
+        """Creates the shard of the calling thread."""
+        shard = self._local.shard = {}
+        with self._lock:
+            self._fold()
+            self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold(self) -> None:
+        """Merges the shards of finished threads into the retired one."""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = live
+
+    def add_collector(self,
+                      collector: Callable[[], Iterable[tuple]]) -> None:
+        """Registers a source of counters and gauges read on scrape.
+
+        Args:
+            collector (Callable): Returns (name, type, labels, value) tuples.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            self._fold()
+            merged = _merge({}, self._retired)
+            for _, shard in self._shards:
+                _merge(merged, shard)
+        lines = []
+        typed = set()
+        for (name, labels), series in sorted(merged.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            count = 0
+            for bound, hits in zip(self.buckets + (None,), series):
+                count += hits
+                le = '+Inf' if bound is None else repr(bound)
+                bucket = _labels(labels + (('le', le),))
+                lines.append(f"{name}_bucket{bucket} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {series[-1]!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for collector in self._collectors:
+            for name, kind, labels, value in collector():
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(target: dict, shard: dict) -> dict:
+    """Adds the series of a shard to another."""
+    for key, series in list(shard.items()):
+        total = target.get(key)
+        if total is None:
+            target[key] = list(series)
+        else:
+            for i, value in enumerate(series):
+                total[i] += value
+    return target
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Formats label pairs, escaped as the text format requires."""
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        value = value.replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+REGISTRY = Registry()
+
+
+class _Stage:
+    """Timer of one stage of the current request."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        """Initializes the timer of a stage."""
+        self.name = name
+
+    def __enter__(self):
+        """Starts timing."""
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Records the elapsed time in the request and stage histogram."""
+        elapsed = time.perf_counter_ns() - self.start
+        stages = getattr(_request, 'stages', None)
+        if stages is not None:
+            stages[self.name] = stages.get(self.name, 0) + elapsed
+        REGISTRY.observe('api_stage_duration_seconds',
+                         (('stage', self.name),), elapsed / 1e9)
+        return False
+
+
+def timer(stage: str):
+    """Returns a context manager timing a stage of the current request.
+
+    Args:
+        stage (str): The stage name, as shown in Server-Timing.
+
+    Returns:
+        A timer, or a shared no-op context when metrics are disabled.
+    """
+    if not ENABLED:
+        return _NULL
+    return _Stage(stage)
+
+
+def start_request() -> None:
+    """Starts timing the request handled by this thread."""
+    _request.start = time.perf_counter_ns()
+    _request.stages = {}
+
+
+def finish_request(method: str, route: str,
+                   status: int) -> Optional[str]:
+    """Records the request latency and describes its stages.
+
+    Args:
+        method (str): The HTTP method.
+        route (str): The matched URL rule.
+        status (int): The response status code.
+
+    Returns:
+        Optional[str]: The Server-Timing header value, or None if the
+        request was not started with start_request.
+    """
+    stages: Dict[str, int] = getattr(_request, 'stages', None)
+    if stages is None:
+        return None
+    total = time.perf_counter_ns() - _request.start
+    _request.stages = None
+    REGISTRY.observe(
+        'api_request_duration_seconds',
+        (('method', method), ('route', route), ('status', str(status))),
+        total / 1e9,
+    )
+    entries: List[str] = [f"{name};dur={ns / 1e6:.3f}"
+                          for name, ns in stages.items()]
+    entries.append(f"total;dur={total / 1e6:.3f}")
+    return ', '.join(entries)
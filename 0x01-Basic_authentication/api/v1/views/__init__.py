@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""API views package.
+"""
+from flask import Blueprint
+
+app_views = Blueprint("app_views", __name__, url_prefix="/api/v1")
+
+from api.v1.views.index import *  # noqa: E402,F401,F403
+from api.v1.views.user import *  # noqa: E402,F401,F403
+from models.user import User  # noqa: E402
+
+User.load_from_file()
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """Index view routes.
 """
-from flask import jsonify, abort
+from datetime import datetime, timedelta
+from flask import Response, jsonify, abort
+from api.v1 import metrics
 from api.v1.views import app_views
 
 
@@ -18,13 +20,38 @@ def status() -> str:
 def stats() -> str:
     """GET /api/v1/stats
     Returns:
-      - Object count stats in JSON format.
+      - Object count stats in JSON format: the number of users, of users
+        with a name, of users updated in the last 24 hours, and of users
+        created per day.
     """
     from models.user import User
-    stats = {'users': User.count()}
+    now = datetime.utcnow()
+    last_24h = [(now - timedelta(hours=hours)).strftime('%Y-%m-%dT%H')
+                for hours in range(24)]
+    stats = {
+        'users': User.count(),
+        'users_with_name': User.aggregate('with_name').total,
+        'users_updated_last_24h':
+            User.aggregate('updated_per_hour').sum(last_24h),
+        'users_created_per_day': User.aggregate('created_per_day').counts(),
+    }
     return jsonify(stats)
 
 
+@app_views.route('/metrics', methods=['GET'], strict_slashes=False)
+def metrics_view() -> str:
+    """GET /api/v1/metrics
+    Returns:
+      - Request, stage and auth cache metrics in the Prometheus text
+        format.
+      - 404 if metrics are disabled (API_METRICS is not 1).
+    """
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.REGISTRY.render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app_views.route('/unauthorized/', strict_slashes=False)
 def unauthorized() -> None:
     """GET /api/v1/unauthorized
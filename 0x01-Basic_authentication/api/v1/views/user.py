@@ -1,31 +1,117 @@
 #!/usr/bin/env python3
 """User views module.
 """
+from datetime import timezone
+from typing import Tuple
+from urllib.parse import urlencode
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request, stream_with_context
+from models.base import EPOCH, MICROSECOND
 from models.user import User
 
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK = 100
+MAX_BATCH_SIZE = 10000
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+
+def _ndjson(users) -> Response:
+    """Stream users as newline-delimited JSON, one object per line."""
+    def generate():
+        lines = []
+        for user in users:
+            if user is None:
+                continue
+            lines.append(user.to_json_text(cache=False))
+            if len(lines) >= STREAM_CHUNK:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson')
+
+
+def _all_users():
+    """Yield every User in id order, reading one page at a time."""
+    after = None
+    while True:
+        users = User.page(STREAM_CHUNK, after)
+        yield from users
+        if len(users) < STREAM_CHUNK:
+            return
+        after = users[-1].id
+
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """GET /api/v1/users
+    Query string:
+      - limit (optional): page size, ordered by id, at most 1000.
+      - after (optional): id of the last User of the previous page.
+      - format (optional): `ndjson` to stream one User per line.
     Returns:
-      - JSON list of all User objects.
+      - JSON list of all User objects, or of one page with a
+        `Link: <...>; rel="next"` header when more Users follow.
+      - 400 if limit is not a positive integer.
     """
-    return jsonify([user.to_json() for user in User.all()])
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    if limit is None and after is None:
+        if ndjson:
+            return _ndjson(_all_users())
+        return jsonify([user.to_json() for user in User.all()])
+
+    try:
+        limit = int(limit) if limit is not None else MAX_PAGE_SIZE
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return jsonify({'error': 'Wrong limit'}), 400
+    users = User.page(min(limit, MAX_PAGE_SIZE), after)
+    if ndjson:
+        response = _ndjson(users)
+    else:
+        response = jsonify([user.to_json() for user in users])
+    if len(users) == min(limit, MAX_PAGE_SIZE):
+        query = urlencode({'limit': limit, 'after': users[-1].id})
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url, query
+        )
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
 def view_one_user(user_id: str) -> str:
     """GET /api/v1/users/<user_id>
     Returns:
-      - JSON representation of a User object.
+      - JSON representation of a User object, with ETag and
+        Last-Modified headers derived from its updated_at.
+      - 304 if If-None-Match or If-Modified-Since shows it is unchanged.
       - 404 if the User ID doesn't exist.
     """
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    updated_at = user.updated_at
+    etag = '{:x}'.format((updated_at - EPOCH) // MICROSECOND)
+    last_modified = updated_at.replace(microsecond=0)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and \
+            last_modified <= since.replace(tzinfo=None)
+    if not_modified:
+        response = Response(status=304)
+    else:
+        response = Response(user.to_json_text() + '\n',
+                            mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -42,6 +128,50 @@ def delete_user(user_id: str) -> str:
     return jsonify({}), 200
 
 
+def _create_user(rj) -> Tuple[dict, int]:
+    """Validate a create payload and save the new User.
+
+    Returns:
+      - The JSON body and status code of the result.
+    """
+    try:
+        if not rj:
+            return {'error': 'Wrong format'}, 400
+        if not rj.get('email'):
+            return {'error': 'email missing'}, 400
+        if not rj.get('password'):
+            return {'error': 'password missing'}, 400
+
+        user = User(
+            email=rj.get('email'),
+            first_name=rj.get('first_name'),
+            last_name=rj.get('last_name')
+        )
+        user.password = rj.get('password')
+        user.save()
+        return user.to_json(), 201
+    except Exception as e:
+        return {'error': f"Can't create User: {e}"}, 400
+
+
+def _update_user(user: User, rj) -> Tuple[dict, int]:
+    """Validate an update payload and save the User.
+
+    Returns:
+      - The JSON body and status code of the result.
+    """
+    try:
+        if not rj:
+            return {'error': 'Wrong format'}, 400
+
+        user.first_name = rj.get('first_name', user.first_name)
+        user.last_name = rj.get('last_name', user.last_name)
+        user.save()
+        return user.to_json(), 200
+    except Exception as e:
+        return {'error': f"Can't update User: {e}"}, 400
+
+
 @app_views.route('/users', methods=['POST'], strict_slashes=False)
 def create_user() -> str:
     """POST /api/v1/users
@@ -56,23 +186,10 @@ def create_user() -> str:
     """
     try:
         rj = request.get_json()
-        if not rj:
-            return jsonify({'error': 'Wrong format'}), 400
-        if not rj.get('email'):
-            return jsonify({'error': 'email missing'}), 400
-        if not rj.get('password'):
-            return jsonify({'error': 'password missing'}), 400
-
-        user = User(
-            email=rj.get('email'),
-            password=rj.get('password'),
-            first_name=rj.get('first_name'),
-            last_name=rj.get('last_name')
-        )
-        user.save()
-        return jsonify(user.to_json()), 201
     except Exception as e:
         return jsonify({'error': f"Can't create User: {e}"}), 400
+    body, status = _create_user(rj)
+    return jsonify(body), status
 
 
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
@@ -92,12 +209,54 @@ def update_user(user_id: str) -> str:
 
     try:
         rj = request.get_json()
-        if not rj:
-            return jsonify({'error': 'Wrong format'}), 400
-
-        user.first_name = rj.get('first_name', user.first_name)
-        user.last_name = rj.get('last_name', user.last_name)
-        user.save()
-        return jsonify(user.to_json()), 200
     except Exception as e:
         return jsonify({'error': f"Can't update User: {e}"}), 400
+    body, status = _update_user(user, rj)
+    return jsonify(body), status
+
+
+def _batch_item(item) -> dict:
+    """Apply one operation of a batch and describe its outcome."""
+    if not isinstance(item, dict) or item.get('op') not in BATCH_OPERATIONS:
+        return {'status': 400, 'error': 'Wrong operation'}
+    if item['op'] == 'create':
+        body, status = _create_user(item.get('data'))
+    else:
+        user_id = item.get('id')
+        user = User.get(user_id) if isinstance(user_id, str) else None
+        if user is None:
+            return {'status': 404, 'error': 'Not found'}
+        if item['op'] == 'delete':
+            user.remove()
+            return {'status': 200, 'id': user.id}
+        body, status = _update_user(user, item.get('data'))
+    if status >= 400:
+        return dict(body, status=status)
+    return {'status': status, 'user': body}
+
+
+@app_views.route('/users/batch', methods=['POST'], strict_slashes=False)
+def batch_users() -> str:
+    """POST /api/v1/users/batch
+    JSON body: a list of at most 10000 operations, each one of
+      - {"op": "create", "data": {...}} with the POST /users fields.
+      - {"op": "update", "id": ..., "data": {...}} with the PUT fields.
+      - {"op": "delete", "id": ...}.
+    Operations are validated like the single-User routes and applied in
+    order under one store lock, then persisted once for the whole batch.
+    Returns:
+      - JSON list of per-operation results, each with the `status` the
+        single-User route would have returned and the `user` or `error`.
+      - 400 if the body is not a list or holds too many operations.
+    """
+    try:
+        rj = request.get_json()
+    except Exception:
+        rj = None
+    if not isinstance(rj, list):
+        return jsonify({'error': 'Wrong format'}), 400
+    if len(rj) > MAX_BATCH_SIZE:
+        return jsonify({'error': 'Too many operations'}), 400
+    with User.batch():
+        results = [_batch_item(item) for item in rj]
+    return jsonify(results), 200
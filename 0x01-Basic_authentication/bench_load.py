@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Load test harness for the Basic-auth API.
+
+Seeds users through the models layer in a temporary directory, then
+replays a weighted mix of authenticated requests from concurrent workers,
+through the Flask test client or a local WSGI server, and reports
+throughput and latency percentiles per route for each store size.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import tempfile
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+MIX = {'get_user': 50, 'list_users': 10, 'create_user': 10,
+       'update_user': 15, 'delete_user': 5, 'stats': 10, 'batch': 0}
+ROUTES = {
+    'get_user': 'GET /api/v1/users/<id>',
+    'list_users': 'GET /api/v1/users?limit=100',
+    'create_user': 'POST /api/v1/users',
+    'update_user': 'PUT /api/v1/users/<id>',
+    'delete_user': 'DELETE /api/v1/users/<id>',
+    'stats': 'GET /api/v1/stats',
+    'batch': 'POST /api/v1/users/batch',
+}
+EMAIL = "bench@example.com"
+PASSWORD = "bench"
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """Parse `op=weight,...` into weights, validating the operation names."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+class Traffic:
+    """Shared state of a run: ids to read, update and delete."""
+
+    def __init__(self, ids: List[str], seed: int):
+        """Start from the ids of the seeded users."""
+        self.ids = ids
+        self.created = []
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def pick(self) -> str:
+        """A random seeded user id."""
+        return self.ids[self.rng.randrange(len(self.ids))]
+
+    def created_id(self):
+        """An id created during the run, removed from the pool, or None."""
+        with self.lock:
+            return self.created.pop() if self.created else None
+
+
+def request_for(op: str, traffic: Traffic, n: int,
+                batch_size: int = 100) -> Tuple[str, str, object]:
+    """The method, path and JSON body of one operation.
+
+    A batch alternates creates and updates of seeded users.
+    """
+    if op == 'delete_user':
+        user_id = traffic.created_id()
+        if user_id is not None:
+            return 'DELETE', f"/api/v1/users/{user_id}", None
+        op = 'get_user'
+    if op == 'get_user':
+        return 'GET', f"/api/v1/users/{traffic.pick()}", None
+    if op == 'list_users':
+        return 'GET', "/api/v1/users?limit=100", None
+    if op == 'create_user':
+        return 'POST', "/api/v1/users", {
+            'email': f"load{threading.get_ident()}-{n}@example.com",
+            'password': 'pwd', 'first_name': 'Load'}
+    if op == 'update_user':
+        return 'PUT', f"/api/v1/users/{traffic.pick()}", {'last_name': f"L{n}"}
+    if op == 'batch':
+        return 'POST', "/api/v1/users/batch", [
+            {'op': 'create', 'data': {
+                'email': f"load{threading.get_ident()}-{n}-{i}@example.com",
+                'password': 'pwd', 'first_name': 'Load'}}
+            if i % 2 == 0 else
+            {'op': 'update', 'id': traffic.pick(),
+             'data': {'last_name': f"L{n}"}}
+            for i in range(batch_size)]
+    return 'GET', "/api/v1/stats", None
+
+
+def test_client_sender(app) -> Callable[[], Callable]:
+    """Per-worker senders going through the Flask test client."""
+    def make():
+        client = app.test_client()
+
+        def send(method, path, body, headers):
+            response = client.open(path, method=method, json=body,
+                                   headers=headers)
+            return response.status_code, response.get_json(silent=True)
+        return send
+    return make
+
+
+def server_sender(port: int) -> Callable[[], Callable]:
+    """Per-worker senders going through HTTP to a local server."""
+    def make():
+        def send(method, path, body, headers):
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+            try:
+                payload = None if body is None else json.dumps(body)
+                headers = dict(headers, **{'Content-Type': 'application/json'})
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                data = response.read()
+            finally:
+                conn.close()
+            try:
+                return response.status, json.loads(data)
+            except ValueError:
+                return response.status, None
+        return send
+    return make
+
+
+def percentile(samples: List[int], q: float) -> float:
+    """Nearest-rank percentile of sorted nanosecond samples, in ms."""
+    return samples[min(len(samples) - 1, int(len(samples) * q))] / 1e6
+
+
+def run(make_sender, traffic: Traffic, mix: Dict[str, int], requests: int,
+        workers: int, batch_size: int = 100) -> Tuple[Dict[str, dict], float]:
+    """Replay `requests` operations with `workers` concurrent workers."""
+    auth = base64.b64encode(f"{EMAIL}:{PASSWORD}".encode()).decode()
+    headers = {'Authorization': f"Basic {auth}"}
+    ops = traffic.rng.choices(list(mix), weights=list(mix.values()),
+                              k=requests)
+    samples = {op: [] for op in mix}
+    errors = {op: 0 for op in mix}
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        send = make_sender()
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            op = ops[n]
+            method, path, body = request_for(op, traffic, n, batch_size)
+            start = time.perf_counter_ns()
+            status, data = send(method, path, body, headers)
+            elapsed = time.perf_counter_ns() - start
+            with lock:
+                samples[op].append(elapsed)
+                if status >= 400:
+                    errors[op] += 1
+            if op == 'create_user' and status == 201:
+                with traffic.lock:
+                    traffic.created.append(data['id'])
+            elif op == 'batch' and status == 200:
+                with traffic.lock:
+                    traffic.created.extend(r['user']['id'] for r in data
+                                           if r['status'] == 201)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        for future in [pool.submit(worker) for _ in range(workers)]:
+            future.result()
+    wall = time.perf_counter() - start
+    results = {}
+    for op, times in samples.items():
+        if not times:
+            continue
+        times.sort()
+        results[ROUTES[op]] = {
+            'n': len(times), 'errors': errors[op],
+            'p50_ms': percentile(times, 0.50),
+            'p95_ms': percentile(times, 0.95),
+            'p99_ms': percentile(times, 0.99),
+        }
+    return results, wall
+
+
+def seed(User, count: int, rng: random.Random) -> List[str]:
+    """Grow the store to `count` users, persisting once."""
+    with User.batch():
+        if not User.search({'email': EMAIL}):
+            admin = User(email=EMAIL)
+            admin.password = PASSWORD
+            admin.save()
+        for i in range(User.count(), count):
+            user = User(email=f"user{i}-{rng.getrandbits(32)}@example.com",
+                        first_name=f"First{i}", last_name=f"Last{i}")
+            user.password = f"pwd{i}"
+            user.save()
+    return list(User.ids())
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-u', '--users', type=int, nargs='+',
+                        default=[100, 1000, 10000], help="store sizes")
+    parser.add_argument('-n', '--requests', type=int, default=2000,
+                        help="requests per store size")
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument('-m', '--mix', type=parse_mix, default=MIX,
+                        help="operation weights, e.g. get_user=80,stats=20")
+    parser.add_argument('-b', '--batch-size', type=int, default=100,
+                        help="operations per batch request")
+    parser.add_argument('--server', action='store_true',
+                        help="go through a local threaded WSGI server")
+    parser.add_argument('--seed', type=int, default=1337)
+    parser.add_argument('-o', '--output', help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    os.environ['AUTH_TYPE'] = 'basic_auth'
+    cwd = os.getcwd()
+    tmp = tempfile.TemporaryDirectory()
+    os.chdir(tmp.name)
+    from api.v1.app import app
+    from models.user import User
+
+    server = None
+    if args.server:
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        make_sender = server_sender(server.server_port)
+    else:
+        make_sender = test_client_sender(app)
+
+    rng = random.Random(args.seed)
+    report = {}
+    try:
+        for count in sorted(args.users):
+            traffic = Traffic(seed(User, count, rng), args.seed)
+            results, wall = run(make_sender, traffic, args.mix,
+                                args.requests, args.workers, args.batch_size)
+            report[count] = {'throughput': args.requests / wall,
+                             'routes': results}
+            print(f"\n{count} users: {args.requests / wall:.0f} req/s "
+                  f"({args.workers} workers)")
+            print(f"  {'route':<32} {'n':>6} {'err':>5} {'p50 ms':>9} "
+                  f"{'p95 ms':>9} {'p99 ms':>9}")
+            for route, r in results.items():
+                print(f"  {route:<32} {r['n']:>6} {r['errors']:>5} "
+                      f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+                      f"{r['p99_ms']:>9.2f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        os.chdir(cwd)
+        tmp.cleanup()
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
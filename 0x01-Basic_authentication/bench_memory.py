@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Per-user memory benchmark for models.user.User.
+"""
+import sys
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Tuple
+
+from models import base
+from models.user import User
+
+
+class DictUser:
+    """The User layout before __slots__, kept as the baseline.
+
+    Every attribute lives in a per-instance __dict__ and the timestamps
+    are parsed into datetime objects. Base wrote the timestamps through
+    self.__dict__, which materializes a full dict per instance instead
+    of the compact inline attribute values, so this does the same.
+    """
+
+    def __init__(self, **kwargs):
+        """Initialize a user the way the previous Base and User did."""
+        self.id = kwargs['id']
+        for name in ('created_at', 'updated_at'):
+            self.__dict__[name] = datetime.strptime(kwargs[name],
+                                                    base.TIMESTAMP_FORMAT)
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+def bytes_per_user(make: Callable, count: int) -> Tuple[float, float]:
+    """Average bytes allocated per stored user, timestamps parsed.
+
+    Returns the total and the part not spent on the attribute strings.
+    """
+    base.DATA['User'] = {}
+    store = {}
+    payload = 0
+    now = datetime.utcnow().strftime(base.TIMESTAMP_FORMAT)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        user = make(id=f"{i:08d}-0000-4000-8000-000000000000",
+                    email=f"user{i}@example.com", _password=f"{i:064x}",
+                    first_name=f"First{i}", last_name=f"Last{i}",
+                    created_at=now, updated_at=now)
+        user.created_at, user.updated_at
+        store[user.id] = user
+        payload += sum(sys.getsizeof(value) for value in (
+            user.id, user.email, user._password, user.first_name,
+            user.last_name
+        ))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    store.clear()
+    return used / count, (used - payload) / count
+
+
+def page_index_bytes_per_user(count: int) -> float:
+    """Average bytes the sorted ids behind User.page add per user."""
+    base.DATA['User'] = {}
+    base.INDEXES['User'] = User._new_indexes()
+    now = datetime.utcnow().strftime(base.TIMESTAMP_FORMAT)
+    for i in range(count):
+        user = User(id=f"{i:08d}-0000-4000-8000-000000000000",
+                    email=f"user{i}@example.com", created_at=now,
+                    updated_at=now)
+        base.DATA['User'][user.id] = user
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    User.page(1)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    base.DATA['User'] = {}
+    base.INDEXES['User'] = User._new_indexes()
+    return used / count
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    results = [(name, bytes_per_user(make, count))
+               for name, make in (('before', DictUser), ('after', User))]
+    print(f"{count} users, bytes per user:")
+    for name, (total, overhead) in results:
+        print(f"  {name + ':':<8}{total:>5.0f}, "
+              f"{overhead:.0f} beyond the attribute strings")
+    old, new = results[0][1][0], results[1][1][0]
+    print(f"  saved:  {old - new:>5.0f} ({(old - new) / old:.0%})")
+    print(f"  page index: {page_index_bytes_per_user(count):.0f} more once "
+          f"User.page ran")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Startup time benchmark for Base.load_from_file.
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+from models import base
+from models.user import User
+
+
+def seed(count: int):
+    """Write a store of `count` users in the current directory."""
+    base.DATA['User'] = {}
+    now = datetime.utcnow()
+    for i in range(count):
+        user = User(email=f"user{i}@example.com", first_name=f"First{i}",
+                    last_name=f"Last{i}",
+                    created_at=now - timedelta(seconds=i))
+        user.password = f"pwd{i}"
+        base.DATA['User'][user.id] = user
+    User.save_to_file()
+
+
+def timed(load) -> float:
+    """Time one load, returning seconds."""
+    start = time.perf_counter()
+    load()
+    return time.perf_counter() - start
+
+
+def eager_json_load():
+    """The previous path: JSON only, every timestamp parsed up front."""
+    base.BINARY_SNAPSHOT = False
+    try:
+        User.load_from_file()
+        for user in base.DATA['User'].values():
+            user.created_at, user.updated_at
+    finally:
+        base.BINARY_SNAPSHOT = True
+
+
+def main(sizes):
+    """Print load times of both paths for each store size."""
+    print(f"{'users':>10} {'json+eager':>12} {'binary+lazy':>12} "
+          f"{'speedup':>8}")
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                seed(count)
+                old = timed(eager_json_load)
+                new = timed(User.load_from_file)
+            finally:
+                os.chdir(cwd)
+        print(f"{count:>10} {old:>11.3f}s {new:>11.3f}s {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
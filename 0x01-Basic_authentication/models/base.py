@@ -1,80 +1,994 @@
 #!/usr/bin/env python3
 """Base module.
 """
+import gc
+import os
 import json
+import heapq
 import uuid
-from os import path
-from datetime import datetime
-from typing import TypeVar, List, Iterable
+import bisect
+import marshal
+import operator
+import itertools
+import threading
+from functools import partial
+from collections import OrderedDict
+from contextlib import contextmanager
+from os import path, getenv
+from datetime import datetime, timedelta
+from typing import Callable, TypeVar, List, Iterable, Iterator, Tuple, Optional
+
+from models.flusher import Flusher
+from models.journal import Journal
+from models.watcher import Watcher
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
 DATA = {}
+INDEXES = {}
+JOURNALS = {}
+WRITE_LOCKS = {}
+FILE_LOCKS = {}
+FILE_STATS = {}
+BATCHES = {}
+JSON_CACHE = OrderedDict()
+JSON_CACHE_LOCK = threading.Lock()
+JSON_CACHE_SIZE = int(getenv('MODEL_JSON_CACHE_SIZE', '1024'))
+STORAGE = getenv('MODEL_STORAGE', 'file')
+JOURNAL_MAX_BYTES = int(getenv('MODEL_JOURNAL_MAX_BYTES',
+                               str(4 * 1024 * 1024)))
+BINARY_SNAPSHOT = getenv('MODEL_BINARY_SNAPSHOT', '1') == '1'
+FSYNC = getenv('MODEL_FSYNC', '0') == '1'
+SNAPSHOT_VERSION = 2
+BY_DAY = len('YYYY-MM-DD')
+BY_HOUR = len('YYYY-MM-DDTHH')
+QUERY_OPERATORS = ('eq', 'in', 'prefix', 'gt', 'gte', 'lt', 'lte')
+_COMPARISONS = {'gt': operator.gt, 'gte': operator.ge,
+                'lt': operator.lt, 'lte': operator.le}
+FLUSHER = Flusher(
+    interval=float(getenv('MODEL_FLUSH_INTERVAL', '1.0')),
+    max_pending=int(getenv('MODEL_FLUSH_MAX_PENDING', '1000')),
+)
+COHERENCE = getenv('MODEL_COHERENCE', '0') == '1'
+WATCHER = Watcher(interval=float(getenv('MODEL_COHERENCE_INTERVAL', '0.5')))
+if COHERENCE and STORAGE != 'journal':
+    raise ValueError("MODEL_COHERENCE=1 needs MODEL_STORAGE=journal: the "
+                     "other modes rewrite the whole store file, so writers "
+                     "in other processes overwrite each other's changes")
+
+
+def sync():
+    """Persist every pending write-behind mutation now."""
+    FLUSHER.flush()
+
+
+def _after_fork():
+    """Give a forked worker its own journal handles and worker threads."""
+    for journal in JOURNALS.values():
+        journal.after_fork()
+    FLUSHER.after_fork()
+    WATCHER.after_fork()
+
+
+def _file_stat(file_path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of a store file version: inode, size and mtime."""
+    try:
+        return _stamp(os.stat(file_path))
+    except FileNotFoundError:
+        return None
+
+
+def _stamp(stat: os.stat_result) -> Tuple[int, int, int]:
+    """Inode, size and mtime of a stat result."""
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _forget_json(obj: TypeVar('Base')):
+    """Drop the cached JSON text of an object."""
+    with JSON_CACHE_LOCK:
+        JSON_CACHE.pop((obj.__class__.__name__, obj.id), None)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+class Index:
+    """Hash index mapping one attribute's values to stored objects."""
+
+    def __init__(self, attribute: str):
+        """Initialize an empty index on an attribute."""
+        self.attribute = attribute
+        self._buckets = {}
+        self._values = {}
+
+    def add(self, obj: TypeVar('Base')):
+        """Index an object under its current attribute value."""
+        self.discard(obj.id)
+        value = getattr(obj, self.attribute, None)
+        try:
+            bucket = self._buckets.setdefault(value, {})
+        except TypeError:
+            return
+        bucket[obj.id] = obj
+        self._values[obj.id] = value
+
+    def discard(self, obj_id: str):
+        """Drop an object from the index."""
+        if obj_id not in self._values:
+            return
+        value = self._values.pop(obj_id)
+        bucket = self._buckets[value]
+        del bucket[obj_id]
+        if not bucket:
+            del self._buckets[value]
+
+    def lookup(self, value) -> Optional[Iterable[TypeVar('Base')]]:
+        """Return the objects stored under a value.
+
+        None if the value cannot be hashed.
+        """
+        try:
+            return self._buckets.get(value, {}).values()
+        except TypeError:
+            return None
+
+    def estimate(self, op: str, value) -> Optional[int]:
+        """Return how many ids `scan` would yield.
+
+        None if the index cannot serve the query.
+        """
+        if op not in ('eq', 'in'):
+            return None
+        try:
+            return sum(len(self._buckets.get(v, ()))
+                       for v in _values(op, value))
+        except TypeError:
+            return None
+
+    def scan(self, op: str, value, reverse: bool = False) -> Iterable[str]:
+        """Return the ids stored under the queried values."""
+        ids = []
+        for v in dict.fromkeys(_values(op, value)):
+            ids.extend(self._buckets.get(v, ()))
+        return ids
+
+
+class _Top:
+    """Sorts after every other value."""
+
+    def __lt__(self, other) -> bool:
+        """Nothing is greater."""
+        return False
+
+    def __gt__(self, other) -> bool:
+        """Everything else is smaller."""
+        return True
+
+
+_TOP = _Top()
+
+
+def _values(op: str, value) -> tuple:
+    """The values an eq or in condition selects."""
+    return (value,) if op == 'eq' else value
+
+
+def _order_key(value) -> tuple:
+    """Total order over mixed values: grouped by type, None last."""
+    return (value is None, type(value).__name__, value)
+
+
+class SortedChunks:
+    """Sorted list kept in chunks of at most 2 * LOAD items.
+
+    The last item of every chunk is kept in `_maxes`: an insert or a
+    removal bisects to its chunk and shifts only that chunk. Readers
+    copy one chunk at a time under a short lock and resume after the
+    last item they saw, so iterations stay consistent while writers go
+    on.
+    """
+
+    LOAD = 512
+
+    def __init__(self, items: Iterable = ()):
+        """Initialize the list from items already in order."""
+        items = list(items)
+        load = self.LOAD
+        self._chunks = [items[i:i + load] for i in range(0, len(items), load)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._lock = threading.Lock()
+
+    def __contains__(self, item) -> bool:
+        """Check whether an item is in the list."""
+        with self._lock:
+            i = bisect.bisect_left(self._maxes, item)
+            if i == len(self._chunks):
+                return False
+            chunk = self._chunks[i]
+            return chunk[bisect.bisect_left(chunk, item)] == item
+
+    def insert(self, item):
+        """Insert an item; TypeError if it cannot be ordered in the list."""
+        with self._lock:
+            chunks, maxes = self._chunks, self._maxes
+            if not chunks:
+                chunks.append([item])
+                maxes.append(item)
+                return
+            i = min(bisect.bisect_left(maxes, item), len(chunks) - 1)
+            chunk = chunks[i]
+            bisect.insort(chunk, item)
+            maxes[i] = chunk[-1]
+            if len(chunk) > 2 * self.LOAD:
+                chunks.insert(i + 1, chunk[self.LOAD:])
+                del chunk[self.LOAD:]
+                maxes.insert(i, chunk[-1])
+
+    def remove(self, item):
+        """Remove an item that is in the list."""
+        with self._lock:
+            chunks, maxes = self._chunks, self._maxes
+            i = bisect.bisect_left(maxes, item)
+            chunk = chunks[i]
+            del chunk[bisect.bisect_left(chunk, item)]
+            if chunk:
+                maxes[i] = chunk[-1]
+            else:
+                del chunks[i]
+                del maxes[i]
+
+    def count(self, start, stop) -> int:
+        """Number of items from `start` up to `stop`."""
+        with self._lock:
+            return self._position(stop) - self._position(start)
+
+    def _position(self, key) -> int:
+        """Number of items lower than a key; the caller holds the lock."""
+        chunks = self._chunks
+        i = bisect.bisect_left(self._maxes, key)
+        lower = sum(len(chunk) for chunk in chunks[:i])
+        if i < len(chunks):
+            lower += bisect.bisect_left(chunks[i], key)
+        return lower
+
+    def ascending(self, start=None, stop=None,
+                  strict: bool = False) -> Iterator:
+        """Yield the items from `start` up to `stop`, None being open.
+
+        With `strict` the items equal to `start` are skipped.
+        """
+        first = bisect.bisect_right if strict else bisect.bisect_left
+        while True:
+            with self._lock:
+                i = 0 if start is None else first(self._maxes, start)
+                if i == len(self._chunks):
+                    return
+                chunk = self._chunks[i]
+                batch = chunk[0 if start is None else first(chunk, start):]
+            for item in batch:
+                if stop is not None and not item < stop:
+                    return
+                yield item
+            start, first = batch[-1], bisect.bisect_right
+
+    def descending(self, start=None, stop=None) -> Iterator:
+        """Yield the items below `stop` down to `start`, None being open."""
+        while True:
+            with self._lock:
+                if stop is None:
+                    i, batch = len(self._chunks), []
+                else:
+                    i = bisect.bisect_left(self._maxes, stop)
+                    batch = []
+                    if i < len(self._chunks):
+                        chunk = self._chunks[i]
+                        batch = chunk[:bisect.bisect_left(chunk, stop)]
+                if not batch:
+                    if not i:
+                        return
+                    batch = self._chunks[i - 1][:]
+            for item in reversed(batch):
+                if start is not None and item < start:
+                    return
+                yield item
+            stop = batch[0]
+
+
+class SortedIndex:
+    """Ordered index of one attribute, serving ranges, prefixes and sorting.
+
+    Entries are `_order_key(value) + (id,)` tuples in a SortedChunks,
+    and `_keys` maps every id to its entry. Values that cannot be
+    ordered among their own type mark the index incomplete, and the
+    planner skips it.
+    """
+
+    def __init__(self, attribute: str):
+        """Initialize an empty index on an attribute."""
+        self.attribute = attribute
+        self.complete = True
+        self._entries = SortedChunks()
+        self._keys = {}
+
+    def build(self, objs: Iterable[TypeVar('Base')]):
+        """Index many objects at once."""
+        attribute = self.attribute
+        entries = [_order_key(getattr(obj, attribute, None)) + (obj.id,)
+                   for obj in objs]
+        try:
+            entries.sort()
+        except TypeError:
+            for entry in entries:
+                self._insert(entry)
+            return
+        self._keys = {entry[-1]: entry for entry in entries}
+        self._entries = SortedChunks(entries)
+
+    def add(self, obj: TypeVar('Base')):
+        """Index an object under its current attribute value."""
+        entry = _order_key(getattr(obj, self.attribute, None)) + (obj.id,)
+        if self._keys.get(obj.id) != entry:
+            self.discard(obj.id)
+            self._insert(entry)
+
+    def _insert(self, entry: tuple):
+        """Insert one entry, giving up on values that cannot be ordered."""
+        try:
+            self._entries.insert(entry)
+        except TypeError:
+            self.complete = False
+            return
+        self._keys[entry[-1]] = entry
+
+    def discard(self, obj_id: str):
+        """Drop an object from the index."""
+        entry = self._keys.pop(obj_id, None)
+        if entry is not None:
+            self._entries.remove(entry)
+
+    @staticmethod
+    def _bounds(op: str, value) -> Tuple[tuple, tuple]:
+        """Lowest key and first key past the entries matching a condition."""
+        key = _order_key(value)
+        start, stop = key[:2], key[:2] + (_TOP,)
+        if op == 'eq':
+            start, stop = key, key + (_TOP,)
+        elif op == 'prefix':
+            start = key
+            if value:
+                stop = key[:2] + (value[:-1] + chr(ord(value[-1]) + 1),)
+        elif op == 'gt':
+            start = key + (_TOP,)
+        elif op == 'lte':
+            stop = key + (_TOP,)
+        elif op == 'gte':
+            start = key
+        elif op == 'lt':
+            stop = key
+        return start, stop
+
+    def estimate(self, op: str, value) -> Optional[int]:
+        """Return how many ids `scan` would yield.
+
+        None if the index cannot serve the query.
+        """
+        if not self.complete or op not in QUERY_OPERATORS:
+            return None
+        if (op == 'prefix' and not isinstance(value, str)
+                or op in _COMPARISONS and value is None):
+            return None
+        try:
+            bounds = ([self._bounds('eq', v) for v in value] if op == 'in'
+                      else [self._bounds(op, value)])
+            return sum(self._entries.count(start, stop)
+                       for start, stop in bounds)
+        except (TypeError, ValueError):
+            return None
+
+    def scan(self, op: Optional[str] = None, value=None,
+             reverse: bool = False) -> Iterator[str]:
+        """Yield the matching ids in value order, every id when `op` is None.
+
+        Ids whose value is None come last in either direction.
+        """
+        entries = self._entries
+        if op is None:
+            if not reverse:
+                walk = entries.ascending()
+            else:
+                walk = itertools.chain(entries.descending(None, (True,)),
+                                       entries.ascending((True,)))
+        elif op == 'in':
+            return itertools.chain.from_iterable(
+                self.scan('eq', v, reverse) for v in dict.fromkeys(value))
+        elif reverse:
+            walk = entries.descending(*self._bounds(op, value))
+        else:
+            walk = entries.ascending(*self._bounds(op, value))
+        return (entry[-1] for entry in walk)
+
+
+class SortedIds:
+    """Ids of the stored objects in order, serving `Base.page`.
+
+    Ids are unique strings, so they are kept bare in a SortedChunks,
+    without the order keys and id map of a SortedIndex. An id that
+    cannot be ordered among the others marks it incomplete.
+    """
+
+    def __init__(self):
+        """Initialize an empty list of ids."""
+        self.complete = True
+        self._ids = SortedChunks()
+
+    def build(self, objs: Iterable[TypeVar('Base')]):
+        """List many objects at once."""
+        ids = [obj.id for obj in objs]
+        try:
+            ids.sort()
+        except TypeError:
+            self.complete = False
+            return
+        self._ids = SortedChunks(ids)
+
+    def add(self, obj: TypeVar('Base')):
+        """List an object, once."""
+        if not self.complete:
+            return
+        try:
+            if obj.id not in self._ids:
+                self._ids.insert(obj.id)
+        except TypeError:
+            self.complete = False
+
+    def discard(self, obj_id: str):
+        """Drop an object from the list."""
+        if not self.complete:
+            return
+        try:
+            if obj_id in self._ids:
+                self._ids.remove(obj_id)
+        except TypeError:
+            pass
+
+    def after(self, obj_id: Optional[str] = None) -> Iterator[str]:
+        """Yield the ids in order, starting past `obj_id` when given."""
+        return self._ids.ascending(obj_id, strict=True)
+
+
+class Aggregate:
+    """Count of stored objects per bucket, maintained like an index.
+
+    `key(obj)` returns the bucket of an object, or None to leave it out;
+    a key returning a constant makes a plain counter. Reads cost
+    O(buckets), whatever the number of stored objects.
+    """
+
+    def __init__(self, name: str, key: Callable[[TypeVar('Base')], object]):
+        """Initialize an empty aggregate."""
+        self.name = name
+        self.key = key
+        self.total = 0
+        self._counts = {}
+        self._buckets = {}
+
+    def add(self, obj: TypeVar('Base')):
+        """Count an object in its current bucket."""
+        try:
+            bucket = self.key(obj)
+            hash(bucket)
+        except (AttributeError, TypeError, ValueError):
+            bucket = None
+        if obj.id in self._buckets:
+            if self._buckets[obj.id] == bucket:
+                return
+            self.discard(obj.id)
+        if bucket is not None:
+            self._buckets[obj.id] = bucket
+            self._counts[bucket] = self._counts.get(bucket, 0) + 1
+            self.total += 1
+
+    def discard(self, obj_id: str):
+        """Stop counting an object."""
+        if obj_id not in self._buckets:
+            return
+        bucket = self._buckets.pop(obj_id)
+        count = self._counts[bucket] - 1
+        if count:
+            self._counts[bucket] = count
+        else:
+            del self._counts[bucket]
+        self.total -= 1
+
+    def counts(self) -> dict:
+        """Return a copy of the count of every bucket."""
+        return dict(self._counts)
+
+    def sum(self, buckets: Iterable) -> int:
+        """Return the number of objects in the given buckets."""
+        counts = self._counts
+        return sum(counts.get(bucket, 0) for bucket in buckets)
+
+
+def timestamp_bucket(attribute: str, width: int
+                     ) -> Callable[[TypeVar('Base')], Optional[str]]:
+    """Aggregate key bucketing a timestamp by its `width` first characters.
+
+    BY_DAY gives '2024-01-31', BY_HOUR '2024-01-31T23'. Timestamps not
+    parsed yet are cut from their raw string, keeping loads lazy.
+    """
+    slot = f"_{attribute}"
+
+    def key(obj) -> Optional[str]:
+        value = getattr(obj, slot, None)
+        if isinstance(value, int):
+            value = EPOCH + timedelta(microseconds=value)
+        if isinstance(value, datetime):
+            value = value.strftime(TIMESTAMP_FORMAT)
+        return value[:width] if value else None
+
+    return key
+
+
+def _lazy_timestamp(slot: str) -> property:
+    """Timestamp attribute kept as its raw string until first read.
+
+    Once parsed it is stored as integer microseconds since the epoch,
+    which is smaller than a datetime, and rebuilt on every read.
+    """
+    def getter(self) -> datetime:
+        value = getattr(self, slot)
+        if isinstance(value, str):
+            value = datetime.strptime(value, TIMESTAMP_FORMAT)
+            setattr(self, slot, (value - EPOCH) // MICROSECOND)
+            return value
+        if isinstance(value, int):
+            return EPOCH + timedelta(microseconds=value)
+        return value
+
+    def setter(self, value):
+        if isinstance(value, datetime) and value.tzinfo is None:
+            value = (value - EPOCH) // MICROSECOND
+        setattr(self, slot, value)
+
+    return property(getter, setter)
 
 
 class Base:
-    """Base class for managing data storage and serialization."""
+    """Base class for managing data storage and serialization.
+
+    Base keeps id and timestamps in slots. Subclasses that declare their
+    own `__slots__` get a compact layout without a per-instance `__dict__`;
+    the others keep extra attributes in `__dict__` as usual.
+
+    Writers of a class serialize on that class's lock; readers never lock
+    and work on snapshots taken with atomic dict copies, so they are not
+    blocked by writers and never see a dict change size under them.
+    """
+
+    __slots__ = ('id', '_created_at', '_updated_at')
+    _BASE_FIELDS = (('id', 'id'), ('created_at', '_created_at'),
+                    ('updated_at', '_updated_at'))
+    _FIELDS = {}
+
+    indexed_attributes: Tuple[str, ...] = ()
+    sorted_attributes: Tuple[str, ...] = ('created_at', 'updated_at')
+    aggregates: dict = {}
+    created_at = _lazy_timestamp('_created_at')
+    updated_at = _lazy_timestamp('_updated_at')
 
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a Base instance with ID, timestamps, and data management."""
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            with self.__class__._write_lock():
+                if DATA.get(s_class) is None:
+                    INDEXES[s_class] = self.__class__._new_indexes()
+                    DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
-        self.created_at = datetime.strptime(kwargs.get('created_at'), TIMESTAMP_FORMAT) if kwargs.get('created_at') else datetime.utcnow()
-        self.updated_at = datetime.strptime(kwargs.get('updated_at'), TIMESTAMP_FORMAT) if kwargs.get('updated_at') else datetime.utcnow()
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
+        self.created_at = kwargs.get('created_at') or datetime.utcnow()
+        self.updated_at = kwargs.get('updated_at') or datetime.utcnow()
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """Check if two objects are equal based on type and ID."""
         return isinstance(other, Base) and self.id == other.id
 
+    @classmethod
+    def _fields(cls) -> Tuple[Tuple[str, str], ...]:
+        """(key, slot) pairs of the slotted attributes, in their order."""
+        fields = Base._FIELDS.get(cls)
+        if fields is None:
+            fields = list(Base._BASE_FIELDS)
+            for klass in reversed(cls.__mro__[:cls.__mro__.index(Base)]):
+                slots = klass.__dict__.get('__slots__', ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    if slot not in ('__dict__', '__weakref__'):
+                        fields.append((slot, slot))
+            fields = Base._FIELDS[cls] = tuple(fields)
+        return fields
+
+    def _items(self) -> Iterable[Tuple[str, object]]:
+        """(key, value) pairs of every set attribute.
+
+        Timestamps not parsed yet are returned as they were loaded.
+        """
+        for key, slot in self._fields():
+            try:
+                value = getattr(self, slot)
+            except AttributeError:
+                continue
+            if isinstance(value, int) and slot in ('_created_at',
+                                                   '_updated_at'):
+                value = getattr(self, key)
+            yield key, value
+        yield from getattr(self, '__dict__', {}).items()
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """Convert object to JSON-compatible dictionary."""
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self._items():
             if not for_serialization and key[0] == '_':
                 continue
             result[key] = value.strftime(TIMESTAMP_FORMAT) if isinstance(value, datetime) else value
         return result
 
+    def to_json_text(self, cache: bool = True) -> str:
+        """Return to_json() as JSON text, cached until updated_at changes.
+
+        The texts of the JSON_CACHE_SIZE most recently used objects are
+        kept. With `cache` False a cached text is still used, but a new
+        one is not stored, so a full export does not evict the others.
+        """
+        key = (self.__class__.__name__, self.id)
+        stamp = self._updated_at
+        with JSON_CACHE_LOCK:
+            cached = JSON_CACHE.get(key)
+            if cached is not None and cached[0] == stamp:
+                JSON_CACHE.move_to_end(key)
+                return cached[1]
+        text = json.dumps(self.to_json(), sort_keys=True,
+                          separators=(',', ':'))
+        if cache:
+            with JSON_CACHE_LOCK:
+                JSON_CACHE[key] = (stamp, text)
+                JSON_CACHE.move_to_end(key)
+                while len(JSON_CACHE) > JSON_CACHE_SIZE:
+                    JSON_CACHE.popitem(last=False)
+        return text
+
     @classmethod
     def load_from_file(cls):
-        """Load all objects from a JSON file."""
+        """Load all objects from a JSON file, then replay any journal."""
         s_class = cls.__name__
         file_path = f".db_{s_class}.json"
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        with cls._write_lock():
+            DATA.setdefault(s_class, {})
+            if STORAGE == 'journal':
+                with cls._journal().frozen():
+                    objs, indexes = cls._load(file_path)
+            else:
+                FILE_STATS[s_class] = _file_stat(file_path)
+                objs, indexes = cls._load(file_path)
+            INDEXES[s_class] = indexes
+            DATA[s_class] = objs
+            if STORAGE == 'journal':
+                cls._journal().settle(cls._compact)
+        if COHERENCE:
+            WATCHER.watch(cls)
+
+    @classmethod
+    def refresh(cls):
+        """Merge the changes other processes made to the store on disk.
+
+        In journal mode it applies the records appended by other processes
+        since the last call, or reloads when it lost track of the journal
+        across compactions. Otherwise it rereads the JSON file when its
+        inode, size or mtime changed, keeping objects updated locally after
+        that file was written. The file and write-behind modes rewrite the
+        whole file on every write, so there only one process may write:
+        concurrent writers overwrite each other, and a refresh then drops
+        the objects another writer's file left out. MODEL_COHERENCE is
+        refused outside journal mode for that reason.
+        """
+        s_class = cls.__name__
+        if DATA.get(s_class) is None:
+            return
+        with cls._write_lock():
+            if STORAGE == 'journal':
+                journal = cls._journal()
+                if not journal.follow(cls._merge):
+                    with journal.frozen():
+                        objs, _ = cls._load(f".db_{s_class}.json")
+                    for obj_id in list(DATA[s_class]):
+                        if obj_id not in objs:
+                            cls._merge('remove', obj_id, None)
+                    for obj_id, obj in objs.items():
+                        cls._merge('save', obj_id, obj.to_json(True))
+                return
+            file_path = f".db_{s_class}.json"
+            stat = _file_stat(file_path)
+            if stat is None or stat == FILE_STATS.get(s_class):
+                return
+            FILE_STATS[s_class] = stat
+            written = EPOCH + timedelta(microseconds=stat[2] // 1000)
+            objs_json = cls._read_snapshot(file_path)
+            for obj_id, obj in list(DATA[s_class].items()):
+                if obj_id not in objs_json and obj.updated_at <= written:
+                    cls._merge('remove', obj_id, None)
+            for obj_id, obj_json in objs_json.items():
+                obj = DATA[s_class].get(obj_id)
+                if obj is None or obj.updated_at <= written:
+                    cls._merge('save', obj_id, obj_json)
+
+    @classmethod
+    def _merge(cls, op: str, obj_id: str, obj_json: Optional[dict]):
+        """Apply one mutation made elsewhere, updating objects in place."""
+        s_class = cls.__name__
+        objs = DATA[s_class]
+        indexes = INDEXES[s_class].values()
+        obj = objs.get(obj_id)
+        if op == 'remove':
+            if obj is not None:
+                del objs[obj_id]
+                for index in indexes:
+                    index.discard(obj_id)
+                _forget_json(obj)
+            return
+        if obj is None:
+            obj = objs[obj_id] = cls(**obj_json)
+        elif obj.to_json(True) == obj_json:
             return
+        else:
+            for key, value in obj_json.items():
+                try:
+                    setattr(obj, key, value)
+                except AttributeError:
+                    continue
+            _forget_json(obj)
+        for index in indexes:
+            index.add(obj)
 
+    @classmethod
+    def _load(cls, file_path: str) -> Tuple[dict, dict]:
+        """Build the objects and indexes of the snapshot and journal."""
+        objs = {}
+        indexes = cls._new_indexes()
+
+        def _apply(op, obj_id, obj_json):
+            if obj_id in objs:
+                for index in indexes.values():
+                    index.discard(obj_id)
+            if op == 'remove':
+                objs.pop(obj_id, None)
+                return
+            obj = cls(**obj_json)
+            objs[obj_id] = obj
+            for index in indexes.values():
+                index.add(obj)
+
+        if path.exists(file_path):
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                for obj_id, obj_json in cls._read_snapshot(file_path).items():
+                    objs[obj_id] = cls(**obj_json)
+                for index in indexes.values():
+                    for obj in objs.values():
+                        index.add(obj)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        if STORAGE == 'journal':
+            cls._journal().replay(_apply)
+        return objs, indexes
+
+    @classmethod
+    def save_to_file(cls, fsync: bool = True, binary: bool = True):
+        """Save all objects to a JSON file, atomically replacing the old one.
+
+        With `fsync` the file reaches the disk before it replaces the old
+        one, so it survives power loss, at the cost of a disk flush per
+        call. The write-behind flusher and journal compactions always
+        fsync. File mode rewrites the store on every mutation and only
+        fsyncs with MODEL_FSYNC=1; without it, a crashed process still
+        never leaves a torn file behind.
+
+        With `binary` it also refreshes the marshal copy read at startup.
+        File mode skips that on every mutation and lets the next load,
+        which finds the copy stale, write it once.
+        """
+        s_class = cls.__name__
+        with FILE_LOCKS.setdefault(s_class, threading.Lock()):
+            objs_json = {obj_id: obj.to_json(True)
+                         for obj_id, obj in list(DATA[s_class].items())}
+            cls._write_store(objs_json, fsync, binary)
+
+    @classmethod
+    def _write_store(cls, objs_json: dict, fsync: bool, binary: bool):
+        """Replace the JSON file, and its binary copy with `binary`.
+
+        Callers hold the file lock of the class.
+        """
+        s_class = cls.__name__
+        file_path = f".db_{s_class}.json"
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(objs_json, f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        stat = os.stat(tmp_path)
+        os.replace(tmp_path, file_path)
+        FILE_STATS[s_class] = _stamp(stat)
+        if binary and BINARY_SNAPSHOT:
+            cls._write_binary_snapshot(stat, objs_json)
+
+    @classmethod
+    def _write_binary_snapshot(cls, stat: os.stat_result, objs_json: dict):
+        """Write a marshal copy of the JSON store, stamped with its stat."""
+        bin_path = f".db_{cls.__name__}.bin"
+        tmp_path = f"{bin_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump((SNAPSHOT_VERSION, *_stamp(stat), objs_json), f)
+        os.replace(tmp_path, bin_path)
+
+    @classmethod
+    def _read_snapshot(cls, file_path: str) -> dict:
+        """Read the store from its binary copy when it matches the JSON file.
+
+        Otherwise read the JSON file and write a fresh binary copy, so
+        the mutations that skip it only cost the next load one JSON parse.
+        """
+        bin_path = f".db_{cls.__name__}.bin"
         with open(file_path, 'r') as f:
+            stat = os.fstat(f.fileno())
+            stamp = (SNAPSHOT_VERSION, *_stamp(stat))
+            if BINARY_SNAPSHOT and path.exists(bin_path):
+                try:
+                    with open(bin_path, 'rb') as b:
+                        *written, objs_json = marshal.loads(b.read())
+                    if tuple(written) == stamp:
+                        return objs_json
+                except (OSError, EOFError, ValueError, TypeError):
+                    pass
             objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        if BINARY_SNAPSHOT:
+            try:
+                cls._write_binary_snapshot(stat, objs_json)
+            except OSError:
+                pass
+        return objs_json
 
     @classmethod
-    def save_to_file(cls):
-        """Save all objects to a JSON file."""
+    def _journal(cls) -> Journal:
+        """Return the journal of this class."""
+        s_class = cls.__name__
+        if s_class not in JOURNALS:
+            JOURNALS[s_class] = Journal(s_class, JOURNAL_MAX_BYTES)
+        return JOURNALS[s_class]
+
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """Group saves and removes: hold the class lock, persist once on exit.
+
+        Mutations applied before an exception are still persisted, since
+        they are already visible in memory.
+        """
+        s_class = cls.__name__
+        with cls._write_lock():
+            if s_class in BATCHES:
+                yield
+                return
+            BATCHES[s_class] = []
+            try:
+                yield
+            finally:
+                mutations = BATCHES.pop(s_class)
+                if mutations:
+                    cls._persist_many(mutations)
+
+    @classmethod
+    def _persist(cls, op: str, obj: TypeVar('Base')):
+        """Persist one mutation, or queue it when a batch is open."""
+        mutations = BATCHES.get(cls.__name__)
+        if mutations is not None:
+            mutations.append((op, obj))
+        else:
+            cls._persist_many([(op, obj)])
+
+    @classmethod
+    def _persist_many(cls, mutations: List[Tuple[str, TypeVar('Base')]]):
+        """Persist mutations with the configured storage mode."""
+        if STORAGE == 'journal':
+            records = [(op, obj.id,
+                        obj.to_json(True) if op == 'save' else None)
+                       for op, obj in mutations]
+            cls._journal().append_many(records, cls._compact)
+        elif STORAGE == 'write_behind':
+            FLUSHER.mark(cls)
+        else:
+            cls.save_to_file(fsync=FSYNC, binary=False)
+
+    @classmethod
+    def _compact(cls):
+        """Snapshot the store as the files on disk hold it.
+
+        The journals are folded into the last snapshot apart from the
+        objects in memory, so attributes set but not saved yet never
+        reach the snapshot.
+        """
         s_class = cls.__name__
         file_path = f".db_{s_class}.json"
-        objs_json = {obj_id: obj.to_json(True) for obj_id, obj in DATA[s_class].items()}
+        objs_json = (cls._read_snapshot(file_path)
+                     if path.exists(file_path) else {})
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        def _apply(op, obj_id, obj_json):
+            if op == 'remove':
+                objs_json.pop(obj_id, None)
+            else:
+                objs_json[obj_id] = obj_json
+
+        cls._journal().read(_apply)
+        with FILE_LOCKS.setdefault(s_class, threading.Lock()):
+            cls._write_store(objs_json, fsync=True, binary=True)
 
     def save(self):
         """Save the current object and update timestamps."""
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with self.__class__._write_lock():
+            self.updated_at = datetime.utcnow()
+            _forget_json(self)
+            DATA[s_class][self.id] = self
+            for index in INDEXES[s_class].values():
+                index.add(self)
+            self.__class__._persist('save', self)
 
     def remove(self):
         """Remove the current object from storage."""
         s_class = self.__class__.__name__
-        if self.id in DATA[s_class]:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        with self.__class__._write_lock():
+            _forget_json(self)
+            if self.id in DATA[s_class]:
+                del DATA[s_class][self.id]
+                for index in INDEXES[s_class].values():
+                    index.discard(self.id)
+                self.__class__._persist('remove', self)
+
+    @classmethod
+    def _write_lock(cls) -> threading.RLock:
+        """Return the lock serializing the writers of this class."""
+        return WRITE_LOCKS.setdefault(cls.__name__, threading.RLock())
+
+    @classmethod
+    def _new_indexes(cls) -> dict:
+        """Create empty indexes for the declared attributes and aggregates."""
+        indexes = {attr: Index(attr) for attr in cls.indexed_attributes}
+        for name, key in cls.aggregates.items():
+            indexes[f"aggregate:{name}"] = Aggregate(name, key)
+        return indexes
+
+    @classmethod
+    def register_aggregate(cls, name: str,
+                           key: Callable[[TypeVar('Base')], object]):
+        """Declare an aggregate, counting the objects already stored."""
+        s_class = cls.__name__
+        with cls._write_lock():
+            cls.aggregates = {**cls.aggregates, name: key}
+            if DATA.get(s_class) is not None:
+                aggregate = Aggregate(name, key)
+                for obj in DATA[s_class].values():
+                    aggregate.add(obj)
+                INDEXES[s_class] = {**INDEXES[s_class],
+                                    f"aggregate:{name}": aggregate}
+
+    @classmethod
+    def aggregate(cls, name: str) -> Aggregate:
+        """Return a declared aggregate of this class."""
+        return INDEXES[cls.__name__][f"aggregate:{name}"]
 
     @classmethod
     def count(cls) -> int:
@@ -86,15 +1000,195 @@ class Base:
         """Return all stored objects."""
         return cls.search()
 
+    @classmethod
+    def ids(cls) -> Iterable[str]:
+        """Return the ids of all stored objects."""
+        return DATA[cls.__name__].keys()
+
+    @classmethod
+    def page(cls, limit: int,
+             after: Optional[str] = None) -> List[TypeVar('Base')]:
+        """Return up to `limit` objects in id order, after the `after` id.
+
+        Walks the sorted ids, so a page costs O(log n + limit) whatever
+        the size of the store. Ids that cannot be ordered fall back to
+        a scan of every id.
+        """
+        objs = DATA[cls.__name__]
+        index = cls._sorted_ids()
+        if index.complete:
+            ids = index.after(after)
+        else:
+            ids = [obj_id for obj_id in list(objs) if after is None
+                   or _order_key(obj_id) > _order_key(after)]
+            ids = heapq.nsmallest(limit, ids, key=_order_key)
+        page = []
+        for obj_id in ids:
+            obj = objs.get(obj_id)
+            if obj is not None:
+                page.append(obj)
+                if len(page) >= limit:
+                    break
+        return page
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """Retrieve an object by ID."""
         return DATA[cls.__name__].get(id)
 
     @classmethod
-    def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
-        """Search for objects matching specified attributes."""
-        def _search(obj):
-            return all(getattr(obj, k) == v for k, v in attributes.items()) if attributes else True
+    def search(cls,
+               attributes: Optional[dict] = None) -> List[TypeVar('Base')]:
+        """Search for objects whose attributes equal the given values."""
+        conditions = [(key, 'eq', value)
+                      for key, value in (attributes or {}).items()]
+        return list(cls._select(conditions))
+
+    @classmethod
+    def query(cls, order_by: Optional[str] = None, limit: Optional[int] = None,
+              **filters) -> Iterator[TypeVar('Base')]:
+        """Lazily iterate over the objects matching every filter.
+
+        Filters are `attribute=value` or `attribute__<op>=value`, op being
+        one of QUERY_OPERATORS, e.g. `email__prefix='bob'` or
+        `created_at__gte=datetime(2024, 1, 1)`. `order_by` names an
+        attribute, prefixed with '-' for descending order; objects missing
+        it come last.
+        """
+        conditions = []
+        for name, value in filters.items():
+            attribute, _, op = name.partition('__')
+            op = op or 'eq'
+            if op not in QUERY_OPERATORS:
+                raise ValueError(f"Unknown query operator: {op}")
+            if op == 'in':
+                value = tuple(value)
+            conditions.append((attribute, op, value))
+        return cls._select(conditions, order_by, limit)
+
+    @classmethod
+    def _select(cls, conditions: List[tuple], order_by: Optional[str] = None,
+                limit: Optional[int] = None) -> Iterator[TypeVar('Base')]:
+        """Run a query with the plan chosen by `_plan`."""
+        objs = DATA[cls.__name__]
+        ids, ordered = cls._plan(conditions, order_by, limit)
+        if ids is None:
+            candidates = list(objs.values())
+        else:
+            candidates = (objs.get(obj_id) for obj_id in ids)
+        results = (obj for obj in candidates
+                   if obj is not None and _matches(obj, conditions))
+        if order_by and not ordered:
+            attribute = order_by.lstrip('-')
+            reverse = order_by[0] == '-'
+
+            def key(obj):
+                value = getattr(obj, attribute, None)
+                return (value is None) != reverse, _order_key(value)[1:]
+
+            if limit is None:
+                results = sorted(results, key=key, reverse=reverse)
+            else:
+                select = heapq.nlargest if reverse else heapq.nsmallest
+                results = select(limit, results, key=key)
+        elif limit is not None:
+            results = itertools.islice(results, limit)
+        return iter(results)
+
+    @classmethod
+    def _plan(cls, conditions: List[tuple], order_by: Optional[str],
+              limit: Optional[int]) -> Tuple[Optional[Iterable[str]], bool]:
+        """Pick the cheapest way to read the candidates of a query.
+
+        Each condition an index can serve is costed by the number of ids
+        that index would yield, against a full scan. With `order_by` on a
+        sortable attribute, walking that sorted index wins when it should
+        reach enough matches sooner than sorting the candidates would.
+        Returns the candidate ids, None for a full scan, and whether they
+        come in `order_by` order.
+        """
+        total = len(DATA[cls.__name__])
+        order = order_by.lstrip('-') if order_by else None
+        reverse = bool(order_by) and order_by[0] == '-'
+        best, scan, ordered = total, None, False
+        for attribute, op, value in conditions:
+            if attribute == 'id' and op in ('eq', 'in'):
+                ids = _values(op, value)
+                if len(ids) < best:
+                    best, scan, ordered = len(ids), partial(iter, ids), False
+                continue
+            for index in cls._indexes_on(attribute, op):
+                cost = index.estimate(op, value)
+                if cost is not None and cost < best:
+                    walks = (attribute == order and op != 'in'
+                             and isinstance(index, SortedIndex))
+                    best, ordered = cost, walks
+                    scan = partial(index.scan, op, value, reverse and walks)
+        if order and not ordered and order in cls.sorted_attributes and best:
+            wanted = min(limit, best) if limit is not None else best
+            if total * wanted <= best * best:
+                index = cls._sorted_index(order)
+                if index.complete:
+                    return index.scan(reverse=reverse), True
+        return (None if scan is None else scan()), ordered
+
+    @classmethod
+    def _indexes_on(cls, attribute: str, op: str) -> List:
+        """Indexes able to serve a condition, building sorted ones lazily."""
+        indexes = []
+        index = INDEXES.get(cls.__name__, {}).get(attribute)
+        if index is not None and op in ('eq', 'in'):
+            indexes.append(index)
+        elif attribute in cls.sorted_attributes:
+            indexes.append(cls._sorted_index(attribute))
+        return indexes
+
+    @classmethod
+    def _sorted_ids(cls) -> SortedIds:
+        """Return the sorted ids of this class, built on first use."""
+        s_class = cls.__name__
+        index = INDEXES[s_class].get("id:page")
+        if index is None:
+            with cls._write_lock():
+                index = INDEXES[s_class].get("id:page")
+                if index is None:
+                    index = SortedIds()
+                    index.build(list(DATA[s_class].values()))
+                    INDEXES[s_class] = {**INDEXES[s_class], "id:page": index}
+        return index
+
+    @classmethod
+    def _sorted_index(cls, attribute: str) -> SortedIndex:
+        """Return the sorted index of an attribute, built on first use."""
+        s_class = cls.__name__
+        name = f"{attribute}:sorted"
+        index = INDEXES[s_class].get(name)
+        if index is None:
+            with cls._write_lock():
+                index = INDEXES[s_class].get(name)
+                if index is None:
+                    index = SortedIndex(attribute)
+                    index.build(list(DATA[s_class].values()))
+                    INDEXES[s_class] = {**INDEXES[s_class], name: index}
+        return index
+
 
-        return list(filter(_search, DATA[cls.__name__].values()))
+def _matches(obj: Base, conditions: List[tuple]) -> bool:
+    """Check an object against every (attribute, op, value) condition."""
+    for attribute, op, value in conditions:
+        try:
+            actual = getattr(obj, attribute)
+            if op == 'eq':
+                matched = actual == value
+            elif op == 'in':
+                matched = actual in value
+            elif op == 'prefix':
+                matched = isinstance(actual, str) and actual.startswith(value)
+            else:
+                matched = (actual is not None
+                           and _COMPARISONS[op](actual, value))
+        except (AttributeError, TypeError):
+            return False
+        if not matched:
+            return False
+    return True
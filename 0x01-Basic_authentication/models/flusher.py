@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Write-behind flusher module.
+"""
+import atexit
+import threading
+from typing import Type
+
+
+class Flusher:
+    """Background writer persisting dirty model classes in groups.
+
+    Mutations only mark their class dirty; a daemon thread rewrites the
+    dirty stores at most once per `interval` seconds, or as soon as
+    `max_pending` mutations are waiting.
+    """
+
+    def __init__(self, interval: float, max_pending: int):
+        """Initialize an idle flusher."""
+        self.interval = interval
+        self.max_pending = max_pending
+        self._dirty = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def mark(self, cls: Type):
+        """Record that a class has unsaved mutations."""
+        with self._cond:
+            self._dirty[cls.__name__] = cls
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="model-flusher", daemon=True
+                )
+                self._thread.start()
+            if self._pending >= self.max_pending:
+                self._cond.notify()
+
+    def after_fork(self):
+        """Reset a forked child, whose flusher thread did not survive.
+
+        The mutations still pending were made by the parent, which
+        writes them; the child starts a thread on its own first mark.
+        """
+        self._dirty = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        """Flush loop of the background thread."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._pending >= self.max_pending,
+                    timeout=self.interval,
+                )
+            try:
+                self.flush()
+            except Exception:
+                continue
+
+    def flush(self):
+        """Persist and fsync every dirty class now.
+
+        A class that fails to save stays dirty for the next flush, and
+        the first error is raised once every class was tried.
+        """
+        error = None
+        with self._write_lock:
+            with self._cond:
+                dirty, self._dirty, self._pending = self._dirty, {}, 0
+            for name, cls in dirty.items():
+                try:
+                    cls.save_to_file()
+                except Exception as e:
+                    with self._cond:
+                        self._dirty.setdefault(name, cls)
+                    error = error or e
+        if error is not None:
+            raise error
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Journal module.
+"""
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class Journal:
+    """Append-only log of the mutations of one model class.
+
+    Every save or remove appends one JSON line to `.db_<Class>.journal`.
+    Once the journal passes `max_bytes` it is rotated to
+    `.db_<Class>.journal.1` and a background thread writes a fresh
+    snapshot, then deletes the rotated journal.
+
+    Several processes may share a journal: appends hold a shared flock on
+    `.db_<Class>.lock` and rotations an exclusive one, and each record
+    carries the pid of its writer so `follow` can skip our own records.
+    """
+
+    def __init__(self, s_class: str, max_bytes: int):
+        """Initialize the journal of a model class."""
+        self.path = f".db_{s_class}.journal"
+        self.rotated_path = f"{self.path}.1"
+        self.lock_path = f".db_{s_class}.lock"
+        self.compact_lock_path = f".db_{s_class}.compact"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._tail_lock = threading.Lock()
+        self._file = None
+        self._lock_file = None
+        self._tail = None
+        self._offset = 0
+        self._partial = b''
+        self._compacting = False
+
+    def after_fork(self):
+        """Drop the handles and locks a forked child shares with its parent."""
+        for f in (self._file, self._lock_file):
+            if f is not None:
+                f.close()
+        self._file = self._lock_file = None
+        self._lock = threading.Lock()
+        self._tail_lock = threading.Lock()
+        self._compacting = False
+
+    @contextmanager
+    def _flock(self, mode: int):
+        """Hold the inter-process lock of the journal.
+
+        Callers hold `_lock`: the threads of a process share one lock file
+        description, so an unlock would also drop another thread's lock.
+        """
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, 'a')
+        fcntl.flock(self._lock_file, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def append(self, op: str, obj_id: str, obj_json: Optional[dict],
+               write_snapshot: Callable[[], None]):
+        """Durably append one mutation, compacting when the journal is full."""
+        self.append_many([(op, obj_id, obj_json)], write_snapshot)
+
+    def append_many(self, records: list, write_snapshot: Callable[[], None]):
+        """Durably append (op, id, obj) mutations.
+
+        They go out in a single write followed by a single fsync.
+        """
+        pid = os.getpid()
+        data = b''.join(
+            json.dumps({'op': op, 'id': obj_id, 'obj': obj_json,
+                        'pid': pid}).encode('utf-8') + b'\n'
+            for op, obj_id, obj_json in records
+        )
+        with self._lock:
+            if not self._is_current(self._file):
+                self._reopen()
+            with self._flock(fcntl.LOCK_SH):
+                if not self._is_current(self._file):
+                    self._file.close()
+                    self._file = open(self.path, 'ab', buffering=0)
+                view = memoryview(data)
+                while view:
+                    view = view[self._file.write(view):]
+                os.fsync(self._file.fileno())
+                size = self._file.tell()
+            compact = False
+            if not self._compacting and size >= self.max_bytes:
+                with self._flock(fcntl.LOCK_EX):
+                    if (self._is_current(self._file)
+                            and not os.path.exists(self.rotated_path)):
+                        os.replace(self.path, self.rotated_path)
+                        compact = self._compacting = True
+        if compact:
+            threading.Thread(
+                target=self._compact, args=(write_snapshot,), daemon=True
+            ).start()
+
+    def _is_current(self, f) -> bool:
+        """Check that an open handle still is the active journal file."""
+        if f is None:
+            return False
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _reopen(self):
+        """Open the active journal for appending.
+
+        A torn last record left by a crash gets its newline first.
+        """
+        if self._file is not None:
+            self._file.close()
+        with self._flock(fcntl.LOCK_EX):
+            f = open(self.path, 'ab+', buffering=0)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+        self._file = f
+
+    @contextmanager
+    def _compaction(self):
+        """Hold the inter-process lock ordering snapshots and their cleanup.
+
+        It has its own file, so waiting for it never blocks appends.
+        """
+        with open(self.compact_lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _compact(self, write_snapshot: Callable[[], None]):
+        """Write a snapshot and drop the rotated journal it supersedes.
+
+        `write_snapshot` folds the journals into the last snapshot, so
+        under the compaction lock every snapshot covers the ones written
+        before it and the rotated journal present when it started.
+        """
+        try:
+            self._fold(write_snapshot)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    @contextmanager
+    def frozen(self):
+        """Block appends and rotations of every process, e.g. while loading."""
+        with self._lock, self._flock(fcntl.LOCK_EX):
+            yield
+
+    def replay(self, apply: Callable[[str, str, Optional[dict]], None]):
+        """Apply the rotated then the active journal, oldest record first.
+
+        Unreadable records, such as a torn last record left by a crash,
+        are skipped. Afterwards `follow` picks up where the replay ended.
+        """
+        if os.path.exists(self.rotated_path):
+            with open(self.rotated_path, 'rb') as f:
+                self._apply_lines(f.read().split(b'\n'), apply, skip_own=False)
+        with self._tail_lock:
+            if self._tail is not None:
+                self._tail.close()
+            self._open_tail()
+            self._drain(apply, skip_own=False)
+
+    def read(self, apply: Callable[[str, str, Optional[dict]], None]):
+        """Apply the rotated then the active journal, leaving `follow` be.
+
+        Compactions use it under the compaction lock, so the rotated
+        journal stays in place and the active one cannot rotate meanwhile.
+        A record still being appended is left out.
+        """
+        for journal_path in (self.rotated_path, self.path):
+            try:
+                with open(journal_path, 'rb') as f:
+                    lines = f.read().split(b'\n')
+            except FileNotFoundError:
+                continue
+            self._apply_lines(lines[:-1], apply, skip_own=False)
+
+    def follow(self,
+               apply: Callable[[str, str, Optional[dict]], None]) -> bool:
+        """Apply the records other processes appended since the last call.
+
+        Follows the journal across one rotation. Returns False when there
+        is no position to follow from: nothing was replayed yet, or the
+        journal rotated more than once since the last call, so records may
+        only survive in the snapshot and the caller has to reload.
+        """
+        with self._tail_lock:
+            if self._tail is None:
+                return False
+            if self._is_current(self._tail):
+                self._drain(apply)
+                return True
+            self._drain(apply)
+            try:
+                rotated = os.stat(self.rotated_path).st_ino
+            except FileNotFoundError:
+                rotated = None
+            lost = rotated != os.fstat(self._tail.fileno()).st_ino
+            self._tail.close()
+            self._tail = None
+            if lost:
+                return False
+            self._open_tail()
+            self._drain(apply)
+            return True
+
+    def _open_tail(self):
+        """Start following the active journal from its beginning."""
+        open(self.path, 'ab').close()
+        self._tail = open(self.path, 'rb')
+        self._offset = 0
+        self._partial = b''
+
+    def _drain(self, apply: Callable, skip_own: bool = True):
+        """Apply the complete records between the tail position and EOF.
+
+        Reads with pread at our own offset, so a handle inherited across
+        fork never shares its position with another process.
+        """
+        fd = self._tail.fileno()
+        size = os.fstat(fd).st_size
+        if size <= self._offset:
+            return
+        data = os.pread(fd, size - self._offset, self._offset)
+        self._offset += len(data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        self._apply_lines(lines, apply, skip_own)
+
+    @staticmethod
+    def _apply_lines(lines: list, apply: Callable, skip_own: bool):
+        """Apply parsed records, skipping unreadable ones."""
+        pid = os.getpid()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if skip_own and record.get('pid') == pid:
+                continue
+            apply(record['op'], record['id'], record['obj'])
+
+    def settle(self, write_snapshot: Callable[[], None]):
+        """Fold a rotated journal left by an interrupted compaction.
+
+        Call it once the journal has been replayed into memory.
+        """
+        if not os.path.exists(self.rotated_path) or self._compacting:
+            return
+        self._fold(write_snapshot)
+
+    def _fold(self, write_snapshot: Callable[[], None]):
+        """Snapshot and drop the rotated journal, unless another process did.
+
+        A process loading the store may settle a rotated journal before
+        the compaction its rotation started. Under the compaction lock no
+        one else removes the rotated journal, and the active one does not
+        rotate while it exists, so the file checked here is the one the
+        snapshot covers and the one removed.
+        """
+        with self._compaction():
+            if os.path.exists(self.rotated_path):
+                write_snapshot()
+                with self._lock, self._flock(fcntl.LOCK_EX):
+                    os.remove(self.rotated_path)
+
+    def close(self):
+        """Close the journal files."""
+        with self._lock:
+            for f in (self._file, self._lock_file):
+                if f is not None:
+                    f.close()
+            self._file = self._lock_file = None
+        with self._tail_lock:
+            if self._tail is not None:
+                self._tail.close()
+                self._tail = None
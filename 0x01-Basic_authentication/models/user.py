@@ -2,12 +2,22 @@
 """User module.
 """
 import hashlib
-from models.base import Base
+from models.base import BY_DAY, BY_HOUR, Base, timestamp_bucket
 
 
 class User(Base):
     """User model handling user-related data and logic."""
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    indexed_attributes = ('email',)
+    sorted_attributes = ('email', 'created_at', 'updated_at')
+    aggregates = {
+        'with_name':
+            lambda user: True if user.first_name or user.last_name else None,
+        'created_per_day': timestamp_bucket('created_at', BY_DAY),
+        'updated_per_hour': timestamp_bucket('updated_at', BY_HOUR),
+    }
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a User instance with basic details."""
         super().__init__(*args, **kwargs)
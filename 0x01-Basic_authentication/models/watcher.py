@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Store watcher module.
+"""
+import time
+import threading
+from typing import Type
+
+
+class Watcher:
+    """Background poller merging on-disk changes into watched classes.
+
+    It stands in for inotify: every `interval` seconds it calls
+    `refresh()` on each watched class, which checks its files cheaply
+    and merges only what changed.
+    """
+
+    def __init__(self, interval: float):
+        """Initialize a watcher with nothing to watch."""
+        self.interval = interval
+        self._classes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, cls: Type):
+        """Start polling a model class."""
+        with self._lock:
+            self._classes[cls.__name__] = cls
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="model-watcher", daemon=True
+                )
+                self._thread.start()
+
+    def after_fork(self):
+        """Restart polling in a forked child, whose threads did not survive."""
+        self._lock = threading.Lock()
+        self._thread = None
+        for cls in list(self._classes.values()):
+            self.watch(cls)
+
+    def _run(self):
+        """Poll loop of the background thread."""
+        while True:
+            time.sleep(self.interval)
+            for cls in list(self._classes.values()):
+                try:
+                    cls.refresh()
+                except Exception:
+                    continue
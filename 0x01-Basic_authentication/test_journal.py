@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Tests for the journal store shared by several processes.
+
+Run with `python3 -m unittest test_journal`.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WRITERS = 4
+USERS = 200
+
+WRITER = """
+import sys
+from models.user import User
+writer = sys.argv[1]
+User.load_from_file()
+users = []
+for i in range({users}):
+    user = User(email=f"{{writer}}-{{i}}@example.com", last_name='new')
+    user.save()
+    users.append(user)
+for user in users[::2]:
+    user.last_name = 'updated'
+    user.save()
+for user in users[::4]:
+    user.remove()
+""".format(users=USERS)
+
+READER = """
+import sys
+from models.user import User
+User.load_from_file()
+sys.stdin.readline()
+User.refresh()
+print(User.count(), len(User.search({'last_name': 'updated'})))
+"""
+
+
+class TestJournal(unittest.TestCase):
+    """Concurrent writers rotating a tiny journal lose nothing."""
+
+    def setUp(self):
+        """A temporary directory and a journal rotated every few records."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = dict(os.environ, PYTHONPATH=HERE, MODEL_STORAGE='journal',
+                        MODEL_JOURNAL_MAX_BYTES='5000')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+
+    def spawn(self, code: str, *args, **kwargs) -> subprocess.Popen:
+        """Start a Python process on the shared store."""
+        return subprocess.Popen([sys.executable, '-c', code, *args],
+                                cwd=self.tmp.name, env=self.env,
+                                stdout=subprocess.PIPE, text=True, **kwargs)
+
+    def test_fresh_load_sees_every_writer(self):
+        """A fresh load and a follower agree on what all writers did."""
+        reader = self.spawn(READER, stdin=subprocess.PIPE)
+        writers = [self.spawn(WRITER, str(w)) for w in range(WRITERS)]
+        for writer in writers:
+            writer.communicate(timeout=120)
+            self.assertEqual(writer.returncode, 0)
+        followed, _ = reader.communicate('\n', timeout=120)
+        self.assertEqual(reader.returncode, 0)
+        loaded, _ = self.spawn(READER, stdin=subprocess.PIPE).communicate(
+            '\n', timeout=120)
+
+        kept = USERS - len(range(0, USERS, 4))
+        updated = len(range(0, USERS, 2)) - len(range(0, USERS, 4))
+        expected = f"{WRITERS * kept} {WRITERS * updated}\n"
+        self.assertEqual(loaded, expected)
+        self.assertEqual(followed, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
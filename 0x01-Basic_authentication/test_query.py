@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Tests for the query engine of models.base.
+
+Run with `python3 -m unittest test_query`.
+"""
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from models import base
+from models.base import SortedChunks, _COMPARISONS
+from models.user import User
+
+NAMES = (None, 'Ann', 'Bob', 'bob', 'Cy', 'Dee', 'Eve')
+OPERATORS = ('eq', 'in', 'prefix', 'gt', 'gte', 'lt', 'lte')
+START = datetime(2024, 1, 1)
+
+
+def brute_force(users, filters: dict, order_by: str = None) -> list:
+    """Select and order users the slow way, missing values last."""
+    def matches(user):
+        for name, value in filters.items():
+            attribute, _, op = name.partition('__')
+            actual = getattr(user, attribute, None)
+            if op in ('', 'eq'):
+                matched = actual == value
+            elif op == 'in':
+                matched = actual in value
+            elif op == 'prefix':
+                matched = isinstance(actual, str) and actual.startswith(value)
+            else:
+                matched = (actual is not None
+                           and _COMPARISONS[op](actual, value))
+            if not matched:
+                return False
+        return True
+
+    found = [user for user in users if matches(user)]
+    if order_by:
+        attribute = order_by.lstrip('-')
+        present = [u for u in found if getattr(u, attribute) is not None]
+        missing = [u for u in found if getattr(u, attribute) is None]
+        present.sort(key=lambda u: getattr(u, attribute),
+                     reverse=order_by[0] == '-')
+        found = present + missing
+    return found
+
+
+class TestQuery(unittest.TestCase):
+    """Base.query checked against brute force on random stores."""
+
+    def setUp(self):
+        """An empty User store in a temporary directory, tiny chunks."""
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.load = mock.patch.object(SortedChunks, 'LOAD', 4)
+        self.load.start()
+        base.DATA.pop('User', None)
+        base.INDEXES.pop('User', None)
+        base.FILE_STATS.pop('User', None)
+        User.load_from_file()
+        self.rng = random.Random(20240101)
+
+    def tearDown(self):
+        """Drop the store and leave the temporary directory."""
+        self.load.stop()
+        base.DATA.pop('User', None)
+        base.INDEXES.pop('User', None)
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def random_user(self, user: User = None) -> User:
+        """Create a user, or change an existing one, at random."""
+        rng = self.rng
+        user = user or User()
+        email = f"{rng.choice('abc')}{rng.randrange(40)}@example.com"
+        user.email = rng.choice((None, email))
+        user.first_name = rng.choice(NAMES)
+        user.last_name = rng.choice(NAMES)
+        user.created_at = START + timedelta(hours=rng.randrange(100))
+        return user
+
+    def random_filters(self) -> dict:
+        """One or two random conditions."""
+        rng = self.rng
+        filters = {}
+        for _ in range(rng.randint(1, 2)):
+            attribute = rng.choice(('email', 'first_name', 'created_at'))
+            op = rng.choice(OPERATORS)
+            if attribute == 'created_at':
+                value = START + timedelta(hours=rng.randrange(100))
+            elif attribute == 'email':
+                value = f"{rng.choice('abc')}{rng.randrange(40)}@example.com"
+            else:
+                value = rng.choice(NAMES[1:])
+            if op == 'prefix':
+                if attribute == 'created_at':
+                    op = 'gte'
+                else:
+                    value = value[:rng.randint(0, 2)]
+            elif op == 'in':
+                value = [value, rng.choice(NAMES[1:])]
+            filters[f"{attribute}__{op}"] = value
+        return filters
+
+    def check(self, filters: dict, order_by: str = None, limit: int = None):
+        """Compare one query with its brute force result."""
+        expected = brute_force(User.all(), filters, order_by)
+        got = list(User.query(order_by=order_by, limit=limit, **filters))
+        if limit is not None:
+            expected = expected[:limit]
+        message = f"{filters} order_by={order_by} limit={limit}"
+        if order_by:
+            attribute = order_by.lstrip('-')
+            self.assertEqual([getattr(u, attribute) for u in got],
+                             [getattr(u, attribute) for u in expected],
+                             message)
+        if order_by is None or limit is None:
+            self.assertEqual(sorted(u.id for u in got),
+                             sorted(u.id for u in expected), message)
+
+    def test_matches_brute_force_while_the_store_changes(self):
+        """Queries agree with brute force across saves and removes."""
+        rng = self.rng
+        for _ in range(150):
+            self.random_user().save()
+        for _ in range(40):
+            for _ in range(10):
+                users = User.all()
+                if rng.random() < 0.3 and users:
+                    rng.choice(users).remove()
+                elif rng.random() < 0.5 and users:
+                    self.random_user(rng.choice(users)).save()
+                else:
+                    self.random_user().save()
+            order_by = rng.choice((None, 'email', '-email', 'created_at',
+                                   '-created_at', 'first_name'))
+            limit = rng.choice((None, 1, 5, 50))
+            self.check(self.random_filters(), order_by, limit)
+            self.check({}, order_by, limit)
+
+    def test_sorted_indexes_are_split_into_chunks(self):
+        """The sorted indexes in use hold many small chunks."""
+        for _ in range(100):
+            self.random_user().save()
+        self.check({'email__gte': 'b'}, 'email')
+        self.check({'created_at__lt': START + timedelta(hours=50)},
+                   '-created_at', 10)
+        for attribute in ('email', 'created_at'):
+            entries = base.INDEXES['User'][f"{attribute}:sorted"]._entries
+            self.assertGreater(len(entries._chunks), 10)
+            self.assertTrue(all(len(chunk) <= 8 for chunk in entries._chunks))
+
+    def test_page_walks_ids_in_order(self):
+        """Pages cover every id once, in order, across removes."""
+        User.page(1)
+        users = [self.random_user() for _ in range(60)]
+        for user in users:
+            user.save()
+        for user in users[::3]:
+            user.remove()
+        seen, after = [], None
+        while True:
+            page = User.page(7, after)
+            seen.extend(user.id for user in page)
+            if len(page) < 7:
+                break
+            after = page[-1].id
+        self.assertEqual(seen, sorted(user.id for user in users[1::3]
+                                      + users[2::3]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,12 @@ app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.teardown_appcontext
+def close_db_session(exception=None) -> None:
+    """Release the request's database session back to the pool."""
+    AUTH.close_session()
+
+
 @app.route("/", methods=["GET"], strict_slashes=False)
 def index() -> str:
     """Get and addr."""
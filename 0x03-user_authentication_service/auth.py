@@ -105,3 +105,7 @@ class Auth:
             hashed_password=new_password_hash,
             reset_token=None,
         )
+
+    def close_session(self) -> None:
+        """Release the database session of the current thread."""
+        self._db.close_session()
@@ -1,32 +1,74 @@
 #!/usr/bin/env python3
 """Database management module for account from the users records."""
-from sqlalchemy import create_engine, tuple_
+from os import getenv
+from sqlalchemy import create_engine, event, tuple_
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
 
 from user import Base, User
 
+POOL_SIZE = int(getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))
+BUSY_TIMEOUT = float(getenv("DB_BUSY_TIMEOUT", "30"))
+SYNCHRONOUS = getenv("DB_SYNCHRONOUS", "").upper()
+if SYNCHRONOUS not in ("", "OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"Unknown DB_SYNCHRONOUS: {SYNCHRONOUS}")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Let readers run alongside a writer on every new connection.
+
+    Commits stay durable: SQLite keeps synchronous=FULL unless
+    DB_SYNCHRONOUS says otherwise. DB_SYNCHRONOUS=NORMAL skips the fsync
+    of each commit in WAL mode, so a power loss or OS crash may drop the
+    last commits, though it never corrupts the database.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    if SYNCHRONOUS:
+        cursor.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    cursor.close()
+
 
 class DB:
     """Database class for managing account records."""
 
     def __init__(self) -> None:
-        """Initialize a new Database instance."""
-        self._engine = create_engine("sqlite:///a.db", echo=False)
+        """Initialize a new Database instance.
+
+        Connections come from a pool sized by DB_POOL_SIZE and
+        DB_MAX_OVERFLOW, and each thread gets its own session.
+        """
+        self._engine = create_engine(
+            "sqlite:///a.db",
+            echo=False,
+            poolclass=QueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": BUSY_TIMEOUT,
+            },
+        )
+        event.listen(self._engine, "connect", _set_sqlite_pragmas)
         Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
 
     @property
     def _session(self) -> Session:
-        """Memoized From the Start of session object."""
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        """Session of the current thread, created on first use."""
+        return self.__session()
+
+    def close_session(self) -> None:
+        """Close the current thread's session, releasing its connection."""
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Add a new user to the database and returns the User object."""